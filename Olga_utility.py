@@ -4,35 +4,14 @@ import pandas as pd
 import re
 import math
 
+from pvt_table import parse_pvt_points
+
 # ==========================
 # 1. Read .tab file into DataFrame
 # ==========================
 def read_tab_file(uploaded_file):
     content = uploaded_file.read().decode("utf-8")
-
-    # --- Find the LAST COLUMNS= (...) block ---
-    col_matches = re.findall(r"COLUMNS\s*=\s*\((.*?)\)", content, re.DOTALL)
-    if not col_matches:
-        raise ValueError("No COLUMNS header found in file")
-    cols_text = col_matches[-1]  # ✅ use the last one
-    cols = re.split(r"[\s,]+", cols_text.strip())  # split on space/comma
-
-    # --- Extract PVTTABLE POINT rows (after last COLUMNS) ---
-    # Only keep the content after the last "COLUMNS"
-    content_after_cols = content[content.rfind("COLUMNS"):]
-    data = re.findall(r"PVTTABLE POINT\s*=\s*\((.*?)\)", content_after_cols, re.DOTALL)
-
-    rows = []
-    for row in data:
-        # split on commas, strip spaces/tabs
-        values = [x.strip() for x in row.replace("\n", " ").split(",") if x.strip()]
-        values = [float(x) for x in values]
-        rows.append(values)
-
-    # sanity check
-    for i, r in enumerate(rows):
-        if len(r) != len(cols):
-            raise ValueError(f"Row {i} has {len(r)} values but expected {len(cols)}")
+    cols, rows = parse_pvt_points(content)
 
     df = pd.DataFrame(rows, columns=cols)
     return df, cols, content
@@ -4,9 +4,10 @@ This file consolidates:
 1. Calibration data
 2. Scaling methods
 3. Input and output processors
+
+Calibration values are passed in through a CalibrationConfig; when none is
+given, the values from parameters.py are used.
 """
-# Import all calibration parameters (channel displays, calibration values, etc.)
-from parameters import *
 
 # CRL_ERROR_REMOVAL = 5
 # ALICAT_ERROR_REMOVAL = 1
@@ -57,15 +58,66 @@ from parameters import *
 #     'VFD': (0.0, 60.0, 4.0, 16.0),      # 0-60 Hz maps to 4-20mA
 # }
 
+# Inputs below this current (mA) are treated as "no signal from the sensor"
+NO_SIGNAL_MA = 3.8
+# Value scale_input returns for such inputs
+NO_SIGNAL_VALUE = -1
+
+# --------------------------------------------------------------------------
+# Calibration config
+# --------------------------------------------------------------------------
+
+class CalibrationConfig:
+    """Explicit set of calibration tables used by the input/output processors."""
+
+    def __init__(self, channel_display, sensor_calibration_curve, sensor_calibration_linear,
+                 output_calibration, crl_error_removal, alicat_error_removal):
+        """
+        Args:
+            channel_display: {board_id: {channel: {'name', 'unit'}}}
+            sensor_calibration_curve: {(board_id, channel): (I_zero, Span, P_max)}
+            sensor_calibration_linear: {(board_id, channel): (unit_min, unit_max, mA_min, mA_span)}
+            output_calibration: {output_type: (unit_min, unit_max, mA_min, mA_span)}
+            crl_error_removal: Coriolis error removal in T/D
+            alicat_error_removal: AliCat error removal in SLPM
+        """
+        self.channel_display = channel_display
+        self.sensor_calibration_curve = sensor_calibration_curve
+        self.sensor_calibration_linear = sensor_calibration_linear
+        self.output_calibration = output_calibration
+        self.crl_error_removal = crl_error_removal
+        self.alicat_error_removal = alicat_error_removal
+
+    @classmethod
+    def from_parameters(cls, params=None):
+        """
+        Build a config from a parameters module (default: parameters.py).
+
+        Args:
+            params: Module or object exposing the parameters.py names
+        """
+        if params is None:
+            import parameters as params
+
+        return cls(
+            channel_display=params.CHANNEL_DISPLAY,
+            sensor_calibration_curve=params.SENSOR_CALIBRATION_CURVE,
+            sensor_calibration_linear=params.SENSOR_CALIBRATION_LINEAR,
+            output_calibration=params.OUTPUT_CALIBRATION,
+            crl_error_removal=params.CRL_ERROR_REMOVAL,
+            alicat_error_removal=params.ALICAT_ERROR_REMOVAL,
+        )
+
 # --------------------------------------------------------------------------
 # Input and Output Processor Classes
 # --------------------------------------------------------------------------
 
 class InputProcessor:
-    def __init__(self):
-        # Use the sensor calibration data directly
-        self.sensor_calibration_curve = SENSOR_CALIBRATION_CURVE
-        self.sensor_calibration_linear = SENSOR_CALIBRATION_LINEAR
+    def __init__(self, config=None):
+        # Use the sensor calibration data from the config (default: parameters.py)
+        self.config = config if config is not None else CalibrationConfig.from_parameters()
+        self.sensor_calibration_curve = self.config.sensor_calibration_curve
+        self.sensor_calibration_linear = self.config.sensor_calibration_linear
     
     def scale_input(self, board_id, channel, mA_value, calibration=True):
         """
@@ -90,8 +142,8 @@ class InputProcessor:
             key = (board_id, channel)
             
             # When no signal coming from the sensor, return -1
-            if abs(mA_value) < 3.8:
-                return -1, "N/A"
+            if abs(mA_value) < NO_SIGNAL_MA:
+                return NO_SIGNAL_VALUE, "N/A"
             
             if key not in self.sensor_calibration_curve and key not in self.sensor_calibration_linear:
                 # Return raw value if no calibration data is available
@@ -107,7 +159,7 @@ class InputProcessor:
                 # Handle negative values that might occur near zero
                 scaled_value = max(0.0, scaled_value)
                 
-                unit = CHANNEL_DISPLAY[board_id][channel]['unit']
+                unit = self.config.channel_display[board_id][channel]['unit']
                 
                 return scaled_value, unit
             
@@ -120,18 +172,19 @@ class InputProcessor:
                 
                 # Error removal
                 if board_id == 1 and channel == 'I3':
-                    scaled_value = max(0.0, scaled_value - CRL_ERROR_REMOVAL)
+                    scaled_value = max(0.0, scaled_value - self.config.crl_error_removal)
                 elif board_id == 3 and channel == 'I3':
-                    scaled_value = max(0.0, scaled_value - ALICAT_ERROR_REMOVAL)
+                    scaled_value = max(0.0, scaled_value - self.config.alicat_error_removal)
                 
-                unit = CHANNEL_DISPLAY[board_id][channel]['unit']
+                unit = self.config.channel_display[board_id][channel]['unit']
                 
                 return scaled_value, unit
 
 class OutputProcessor:
-    def __init__(self):
+    def __init__(self, config=None):
         
-        self.output_calibration = OUTPUT_CALIBRATION
+        self.config = config if config is not None else CalibrationConfig.from_parameters()
+        self.output_calibration = self.config.output_calibration
     
     def scale_output(self, output_type, unit_value):
         """
@@ -0,0 +1,62 @@
+"""
+Command-line entry point for the CSV cleaning pipeline (no Streamlit needed).
+
+Examples:
+    python csv_cleaner_cli.py /path/to/recording
+    python csv_cleaner_cli.py /path/to/recording --workers 4 --format parquet
+    python csv_cleaner_cli.py /path/to/recording --watch
+"""
+import argparse
+import os
+import sys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CSV Cleaner & Signal Checker")
+    parser.add_argument("folder", help="Directory containing the source CSV files")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="Number of worker processes (default: 1)")
+    parser.add_argument("-f", "--format", dest="output_format", choices=['csv', 'parquet'], default='csv',
+                        help="Output file format (default: csv)")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and process new rows as files grow (csv output only)")
+    parser.add_argument("--poll-interval", type=float, default=None,
+                        help="Seconds between folder scans in watch mode")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only print errors")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.folder):
+        parser.error(f"{args.folder} is not a valid folder.")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.watch and args.output_format != 'csv':
+        parser.error("--watch only supports csv output")
+
+    # Imported here so --help and argument errors stay instant
+    from data_processing import pipeline
+
+    try:
+        pipeline.check_output_format(args.output_format)
+    except ValueError as e:
+        parser.error(str(e))
+
+    def log_fn(msg):
+        if not args.quiet or "✗" in msg:
+            print(msg.strip("\n"), flush=True)
+
+    if args.watch:
+        kwargs = {}
+        if args.poll_interval is not None:
+            kwargs['poll_interval'] = args.poll_interval
+        try:
+            pipeline.watch_csv_folder(args.folder, log_fn, **kwargs)
+        except KeyboardInterrupt:
+            pass
+    else:
+        pipeline.process_csv_folder(args.folder, log_fn, workers=args.workers,
+                                    output_format=args.output_format)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
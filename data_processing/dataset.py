@@ -0,0 +1,239 @@
+"""
+Memory-mapped sliding-window training dataset built from processed experiments.
+
+build_window_dataset() concatenates the board channels of many _Processed files
+into one contiguous on-disk array (windows.bin) plus an index (index.npz) with
+the row offset, length and labels (AliCat, VFD, indicator, WATERCUT) of each
+file. WindowDataset opens that array with np.memmap, so windows are slices of
+the mapped file rather than copies and the dataset size is bounded by disk,
+not RAM. Windows never cross file boundaries.
+"""
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from data_processing.pipeline import BOARD_COLUMNS, parse_setpoints
+
+DATA_FILE = "windows.bin"
+INDEX_FILE = "index.npz"
+LABEL_NAMES = ['AliCat', 'VFD', 'indicator', 'WATERCUT']
+
+
+def find_processed_files(folders, include_signal_error=False):
+    """
+    Return the processed CSV/Parquet files inside one or more folders, sorted.
+
+    Args:
+        folders: Folder path or list of folder paths (e.g. *_Processed_Data)
+        include_signal_error: Also return *_Processed_Signal_Error files
+    """
+    if isinstance(folders, (str, os.PathLike)):
+        folders = [folders]
+
+    suffixes = ['_Processed']
+    if include_signal_error:
+        suffixes.append('_Processed_Signal_Error')
+
+    paths = []
+    for folder in folders:
+        for name in os.listdir(folder):
+            base, ext = os.path.splitext(name)
+            if ext.lower() in ('.csv', '.parquet') and any(base.endswith(s) for s in suffixes):
+                paths.append(os.path.join(folder, name))
+    return sorted(paths)
+
+
+def parse_watercut(path, default=None):
+    """Return the water cut from a 'WC<value>' tag in the path, else default (parameters.WATERCUT)."""
+    m = re.search(r'WC(\d+(?:\.\d+)?)', path)
+    if m:
+        return float(m.group(1))
+    if default is None:
+        from parameters import WATERCUT
+        default = WATERCUT
+    return float(default)
+
+
+def _read_processed(path, channels):
+    """Read the channel columns and label sources of one processed file."""
+    import pandas as pd
+
+    wanted = set(channels) | {'AliCat_Output', 'VFD_Output', 'indicator'}
+    if path.lower().endswith('.parquet'):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path, usecols=lambda c: c in wanted)
+    return df
+
+
+def _file_labels(path, df, watercut):
+    """Return [AliCat, VFD, indicator, WATERCUT] for one processed file."""
+    setpoints = parse_setpoints(os.path.basename(path))
+    if setpoints is None:
+        setpoints = (df['AliCat_Output'].iloc[0], df['VFD_Output'].iloc[0])
+    indicator = df['indicator'].iloc[0] if 'indicator' in df.columns else np.nan
+    return [setpoints[0], setpoints[1], indicator, parse_watercut(path, watercut)]
+
+
+def build_window_dataset(paths, out_dir, log_fn, channels=None, dtype=np.float32, watercut=None):
+    """
+    Concatenate processed files into one on-disk array with an offsets index.
+
+    Args:
+        paths: Processed CSV/Parquet files (see find_processed_files)
+        out_dir: Output directory for windows.bin and index.npz
+        log_fn: Callable receiving status messages
+        channels: Channel columns to store (default: the 8 board channels)
+        dtype: Storage dtype of windows.bin
+        watercut: WATERCUT used when the path has no WC tag (default: parameters.WATERCUT)
+
+    Returns:
+        str: out_dir
+    """
+    channels = list(channels or BOARD_COLUMNS)
+    os.makedirs(out_dir, exist_ok=True)
+
+    offsets, lengths, labels, sources = [], [], [], []
+    total = 0
+    with open(os.path.join(out_dir, DATA_FILE), 'wb') as f:
+        for path in paths:
+            df = _read_processed(path, channels)
+            if df.empty:
+                log_fn(f"  ✗ Skipping empty file {os.path.basename(path)}")
+                continue
+            f.write(np.ascontiguousarray(df[channels].to_numpy(dtype=dtype)).tobytes())
+            offsets.append(total)
+            lengths.append(len(df))
+            labels.append(_file_labels(path, df, watercut))
+            sources.append(path)
+            total += len(df)
+            log_fn(f"  ✓ {os.path.basename(path)}: {len(df)} rows")
+
+    np.savez(
+        os.path.join(out_dir, INDEX_FILE),
+        offsets=np.array(offsets, dtype=np.int64),
+        lengths=np.array(lengths, dtype=np.int64),
+        labels=np.array(labels, dtype=np.float64).reshape(len(labels), len(LABEL_NAMES)),
+        label_names=np.array(LABEL_NAMES),
+        channels=np.array(channels),
+        sources=np.array(sources),
+        dtype=np.array(np.dtype(dtype).str),
+    )
+    log_fn(f"Dataset written to {out_dir}: {len(sources)} files, {total} rows")
+    return out_dir
+
+
+class WindowDataset:
+    """Sliding windows over a memory-mapped dataset written by build_window_dataset."""
+
+    def __init__(self, path, window=None, stride=1):
+        """
+        Args:
+            path: Directory holding windows.bin and index.npz
+            window: Window length in samples (default: parameters.PREDICTION_WINDOW)
+            stride: Step in samples between consecutive windows
+        """
+        if window is None:
+            from parameters import PREDICTION_WINDOW
+            window = PREDICTION_WINDOW
+        if window < 1 or stride < 1:
+            raise ValueError("window and stride must be at least 1")
+
+        with np.load(os.path.join(path, INDEX_FILE), allow_pickle=False) as index:
+            self.offsets = index['offsets']
+            self.lengths = index['lengths']
+            self.labels = index['labels']
+            self.label_names = [str(n) for n in index['label_names']]
+            self.channels = [str(c) for c in index['channels']]
+            self.sources = [str(s) for s in index['sources']]
+            dtype = np.dtype(str(index['dtype']))
+
+        total = int(self.lengths.sum())
+        if total == 0:
+            raise ValueError(f"Dataset in {path} is empty")
+        self.data = np.memmap(os.path.join(path, DATA_FILE), dtype=dtype, mode='r',
+                              shape=(total, len(self.channels)))
+        self.window = window
+        self.stride = stride
+
+        # windows per file and where each file's windows start in the global numbering
+        self.file_windows = np.maximum((self.lengths - window) // stride + 1, 0)
+        self.window_starts = np.concatenate([[0], np.cumsum(self.file_windows)])
+
+    def __len__(self):
+        return int(self.window_starts[-1])
+
+    def _locate(self, indices):
+        """Map global window indices to (file index, first row in self.data)."""
+        indices = np.asarray(indices, dtype=np.int64)
+        if indices.size and (indices.min() < 0 or indices.max() >= len(self)):
+            raise IndexError("window index out of range")
+        file_idx = np.searchsorted(self.window_starts, indices, side='right') - 1
+        rows = self.offsets[file_idx] + (indices - self.window_starts[file_idx]) * self.stride
+        return file_idx, rows
+
+    def __getitem__(self, i):
+        """Return (window, labels) for window i; window is a (window, channels) view."""
+        file_idx, rows = self._locate([i])
+        start = int(rows[0])
+        return self.data[start:start + self.window], self.labels[file_idx[0]]
+
+    def file_view(self, file_idx):
+        """
+        Return all windows of one file as a zero-copy strided view of shape
+        (n_windows, window, channels).
+        """
+        n = int(self.file_windows[file_idx])
+        start = int(self.offsets[file_idx])
+        rows = self.data[start:start + int(self.lengths[file_idx])]
+        row_stride, col_stride = rows.strides
+        return np.lib.stride_tricks.as_strided(
+            rows,
+            shape=(n, self.window, len(self.channels)),
+            strides=(row_stride * self.stride, row_stride, col_stride),
+            writeable=False,
+        )
+
+    def epoch_order(self, epoch=0, seed=0, shuffle=True):
+        """Return the window order for an epoch (a permutation when shuffle is True)."""
+        if not shuffle:
+            return np.arange(len(self), dtype=np.int64)
+        return np.random.default_rng([seed, epoch]).permutation(len(self))
+
+    def get_batch(self, indices):
+        """
+        Gather windows into a batch.
+
+        Returns:
+            tuple: (X of shape (batch, window, channels), labels of shape (batch, 4))
+        """
+        file_idx, rows = self._locate(indices)
+        X = self.data[rows[:, None] + np.arange(self.window)]
+        return X, self.labels[file_idx]
+
+    def iter_batches(self, batch_size, epoch=0, seed=0, shuffle=True, workers=0, drop_last=False):
+        """
+        Yield (X, labels) batches in epoch order.
+
+        With workers > 0, batches are gathered by a thread pool (memmap reads
+        release the GIL) with up to 2 * workers batches prefetched.
+        """
+        order = self.epoch_order(epoch, seed, shuffle)
+        stop = len(order) - len(order) % batch_size if drop_last else len(order)
+        chunks = [order[i:i + batch_size] for i in range(0, stop, batch_size)]
+
+        if workers <= 0:
+            for chunk in chunks:
+                yield self.get_batch(chunk)
+            return
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = []
+            for chunk in chunks:
+                pending.append(pool.submit(self.get_batch, chunk))
+                if len(pending) >= 2 * workers:
+                    yield pending.pop(0).result()
+            for future in pending:
+                yield future.result()
@@ -0,0 +1,246 @@
+"""
+Multi-resolution min/max/mean decimation pyramid for long processed runs.
+
+Level 0 holds the calibrated samples as-is (stored once, as 't' and 'values');
+every following level halves the previous one, so level k summarises blocks of
+2**k samples with their min, max and mean. A query picks the finest level
+whose block count in the requested time range fits the point budget, so a 60 h
+run can be plotted from a few thousand rows instead of every sample.
+
+On disk the pyramid is a folder with one .npy file per array, opened with
+mmap_mode='r', so a query only reads the rows of the level it returns plus a
+few pages of each visited time axis. Levels above 0 are stored as float32 and
+without 'count', which is only needed while building.
+
+min/max keep the no-signal sentinel (NO_SIGNAL_VALUE) so dropouts stay visible
+in the envelope; mean and count only cover valid samples, as in the summary
+index.
+"""
+import json
+import os
+
+import numpy as np
+
+from calibration import NO_SIGNAL_VALUE
+
+# Pyramid folder written next to each processed CSV
+PYRAMID_SUFFIX = "_pyramid"
+PYRAMID_META = "meta.json"
+SUMMARY_DTYPE = np.float32  # on-disk dtype of min/max/mean above level 0
+
+# Default number of rows returned by a query (roughly one per screen pixel)
+DEFAULT_MAX_POINTS = 2000
+
+
+def pyramid_path_for(csv_path):
+    """Return the pyramid folder path that belongs to a processed CSV."""
+    base, _ = os.path.splitext(csv_path)
+    return f"{base}{PYRAMID_SUFFIX}"
+
+
+def _valid(values):
+    """Mask of samples that count towards mean/count (not NaN, not no-signal)."""
+    return ~np.isnan(values) & (values != NO_SIGNAL_VALUE)
+
+
+def _halve(t, lo, hi, mean, count):
+    """Merge neighbouring blocks pairwise to build the next pyramid level."""
+    if len(t) % 2:
+        # Pad with a copy of the last block carrying zero weight
+        t = np.append(t, t[-1])
+        lo = np.vstack([lo, lo[-1:]])
+        hi = np.vstack([hi, hi[-1:]])
+        mean = np.vstack([mean, mean[-1:]])
+        count = np.vstack([count, np.zeros_like(count[-1:])])
+
+    c_a, c_b = count[0::2], count[1::2]
+    merged_count = c_a + c_b
+    total = np.nan_to_num(mean[0::2]) * c_a + np.nan_to_num(mean[1::2]) * c_b
+    with np.errstate(invalid='ignore', divide='ignore'):
+        merged_mean = np.where(merged_count > 0, total / merged_count, np.nan)
+
+    return (
+        t[0::2],
+        np.fmin(lo[0::2], lo[1::2]),
+        np.fmax(hi[0::2], hi[1::2]),
+        merged_mean,
+        merged_count,
+    )
+
+
+class DecimationPyramid:
+    """Per-channel min/max/mean pyramid at power-of-two decimation levels."""
+
+    def __init__(self, channels, levels, time_axis="Elapsed_s"):
+        """
+        Args:
+            channels: List of channel (column) names
+            levels: List of dicts of arrays, level 0 first. Level 0 has 't' and
+                    'values'; every other level has 't', 'min', 'max', 'mean'
+                    and, when built in memory, 'count' (valid samples per
+                    block and channel)
+            time_axis: Name of the column used as the time axis
+        """
+        self.channels = list(channels)
+        self.levels = levels
+        self.time_axis = time_axis
+
+    @classmethod
+    def from_arrays(cls, t, values, channels, time_axis="Elapsed_s"):
+        """
+        Build the pyramid from a time vector and a (samples, channels) array.
+
+        Args:
+            t: 1-D array of sample times (must be non-decreasing)
+            values: 2-D array, one column per channel
+            channels: Channel names matching the columns of values
+            time_axis: Name of the column used as the time axis
+
+        Returns:
+            DecimationPyramid
+        """
+        t = np.asarray(t, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64).reshape(len(t), len(channels))
+
+        valid = _valid(values)
+        lo = hi = values
+        mean = np.where(valid, values, np.nan)
+        count = valid.astype(np.int32)
+        levels = [{'t': t, 'values': values}]
+
+        while len(t) > 1:
+            t, lo, hi, mean, count = _halve(t, lo, hi, mean, count)
+            levels.append({'t': t, 'min': lo, 'max': hi, 'mean': mean, 'count': count})
+
+        return cls(channels, levels, time_axis)
+
+    @classmethod
+    def from_dataframe(cls, df, channels, time_col='Elapsed_s'):
+        """
+        Build the pyramid from a processed DataFrame.
+
+        Falls back to the sample index when time_col is missing or not
+        monotonic (e.g. files flagged with a signal error).
+        """
+        if time_col in df.columns and df[time_col].is_monotonic_increasing and df[time_col].notna().all():
+            t = df[time_col].to_numpy(dtype=np.float64)
+            time_axis = time_col
+        else:
+            t = np.arange(len(df), dtype=np.float64)
+            time_axis = "sample"
+        return cls.from_arrays(t, df[channels].to_numpy(dtype=np.float64), channels, time_axis)
+
+    def save(self, path):
+        """Write the pyramid as a folder of .npy files plus meta.json."""
+        os.makedirs(path, exist_ok=True)
+        # Every file is replaced, not overwritten in place, so readers that
+        # still have the previous pyramid memory-mapped are not affected.
+        for k, level in enumerate(self.levels):
+            for name, arr in level.items():
+                if name == 'count':
+                    continue
+                if name in ('min', 'max', 'mean'):
+                    arr = arr.astype(SUMMARY_DTYPE)
+                file_path = os.path.join(path, f"L{k}_{name}.npy")
+                with open(file_path + ".tmp", 'wb') as f:
+                    np.save(f, np.ascontiguousarray(arr))
+                os.replace(file_path + ".tmp", file_path)
+        # meta.json is written last, so a folder without it is incomplete
+        meta = {'channels': self.channels, 'time_axis': self.time_axis, 'levels': len(self.levels)}
+        meta_path = os.path.join(path, PYRAMID_META)
+        with open(meta_path + ".tmp", 'w') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    @classmethod
+    def load(cls, path):
+        """Open a pyramid folder; the arrays are memory-mapped, not read."""
+        with open(os.path.join(path, PYRAMID_META)) as f:
+            meta = json.load(f)
+        levels = []
+        for k in range(meta['levels']):
+            names = ('t', 'values') if k == 0 else ('t', 'min', 'max', 'mean')
+            levels.append({
+                name: np.load(os.path.join(path, f"L{k}_{name}.npy"), mmap_mode='r')
+                for name in names
+            })
+        return cls(meta['channels'], levels, meta['time_axis'])
+
+    def query(self, t_start=None, t_end=None, max_points=DEFAULT_MAX_POINTS, channels=None):
+        """
+        Return at most max_points blocks covering [t_start, t_end].
+
+        Args:
+            t_start: Start of the time range (None = start of run)
+            t_end: End of the time range (None = end of run)
+            max_points: Upper bound on the number of returned rows
+            channels: Subset of channel names (None = all)
+
+        Returns:
+            dict: 'level', 'block_size', 't', 'min', 'max', 'mean'; the value
+                  arrays have shape (rows, len(channels))
+        """
+        if max_points < 1:
+            raise ValueError("max_points must be at least 1")
+
+        cols = list(range(len(self.channels)))
+        if channels is not None:
+            cols = [self.channels.index(c) for c in channels]
+
+        # Walk from the coarsest level down and stop before the first level
+        # that exceeds the budget, so the finest levels are only read when
+        # the range is narrow enough to need them.
+        chosen = None
+        for k in range(len(self.levels) - 1, -1, -1):
+            t = self.levels[k]['t']
+            i0 = 0 if t_start is None else max(int(np.searchsorted(t, t_start, side='right')) - 1, 0)
+            i1 = len(t) if t_end is None else int(np.searchsorted(t, t_end, side='right'))
+            if i1 - i0 > max_points and chosen is not None:
+                break
+            chosen = (k, i0, i1)
+
+        k, i0, i1 = chosen
+        level = self.levels[k]
+        sl = slice(i0, max(i1, i0))
+        if 'values' in level:
+            values = np.asarray(level['values'][sl])[:, cols]
+            lo = hi = values
+            mean = np.where(_valid(values), values, np.nan)
+        else:
+            lo = np.asarray(level['min'][sl], dtype=np.float64)[:, cols]
+            hi = np.asarray(level['max'][sl], dtype=np.float64)[:, cols]
+            mean = np.asarray(level['mean'][sl], dtype=np.float64)[:, cols]
+        return {
+            'level': k,
+            'block_size': 2 ** k,
+            't': np.asarray(level['t'][sl]),
+            'min': lo,
+            'max': hi,
+            'mean': mean,
+        }
+
+
+def build_pyramid_for_csv(df, csv_path, channels, time_col='Elapsed_s'):
+    """Build and save the pyramid for a processed DataFrame next to csv_path."""
+    pyramid = DecimationPyramid.from_dataframe(df, channels, time_col)
+    out_path = pyramid_path_for(csv_path)
+    pyramid.save(out_path)
+    return out_path
+
+
+# Opened pyramids by folder, with the meta.json mtime they were opened at
+_open_pyramids = {}
+
+
+def query_pyramid(csv_path, t_start=None, t_end=None, max_points=DEFAULT_MAX_POINTS, channels=None):
+    """
+    Query the pyramid stored next to a processed CSV (see DecimationPyramid.query).
+
+    The opened pyramid is kept between calls and reopened when it is rebuilt.
+    """
+    path = pyramid_path_for(csv_path)
+    mtime = os.path.getmtime(os.path.join(path, PYRAMID_META))
+    cached = _open_pyramids.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = _open_pyramids[path] = (mtime, DecimationPyramid.load(path))
+    return cached[1].query(t_start, t_end, max_points, channels)
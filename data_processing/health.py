@@ -0,0 +1,223 @@
+"""
+Single-pass sensor health scan over the 8 board channels (raw mA).
+
+For every channel the scanner marks, per sample:
+- no_signal:   |I| < NO_SIGNAL_MA (the same test as InputProcessor.scale_input)
+- over_range:  I above the full-scale current of the calibration (saturation)
+- under_range: I below the calibrated zero current but still above NO_SIGNAL_MA
+- flatline:    FLATLINE_MIN_SAMPLES or more identical consecutive readings
+- spike:       |I - rolling median| > SPIKE_THRESHOLD * rolling MAD in both a
+               trailing and a centred window, on a sample without another fault
+
+and turns the masks into a run-length fault index (channel, fault, start, end).
+The centred window keeps a step change (start of over-range, end of a flat
+section) from counting as a spike: right after a step its median already sits
+on the new level. Spikes are therefore decided SPIKE_WINDOW - 1 samples late,
+once the centred window is complete. The scanner keeps the tail of the
+previous block, so feeding a file in live blocks gives the same runs as
+scanning it in one go.
+"""
+import numpy as np
+
+from calibration import NO_SIGNAL_MA, CalibrationConfig
+from data_processing.pipeline import BOARD_COLUMNS, board_channel
+
+HEALTH_SUFFIX = "_health.csv"
+FAULTS = ('no_signal', 'over_range', 'under_range', 'flatline', 'spike')
+
+RANGE_MARGIN_MA = 0.05  # tolerance around the calibrated 4-20 mA range
+FLATLINE_MIN_SAMPLES = 50  # identical readings before a channel counts as stuck
+FLATLINE_EPS_MA = 1e-6  # readings closer than this are "identical"
+SPIKE_WINDOW = 31  # samples in the rolling median/MAD window
+SPIKE_THRESHOLD = 6.0  # robust z-score above which a sample is a spike
+SPIKE_MIN_SCALE_MA = 0.05  # floor for the MAD scale so quiet signals are not all spikes
+SPIKE_LAG = 2 * (SPIKE_WINDOW // 2)  # samples a spike decision waits for (centred MAD)
+
+
+def channel_limits(config=None, channels=None):
+    """
+    Return (low_mA, high_mA) arrays with the calibrated zero and full-scale
+    current of each channel, from SENSOR_CALIBRATION_CURVE/LINEAR.
+    """
+    config = config or CalibrationConfig.from_parameters()
+    channels = channels or BOARD_COLUMNS
+    low, high = [], []
+    for col in channels:
+        key = board_channel(col)
+        if key in config.sensor_calibration_curve:
+            i_zero, span, _ = config.sensor_calibration_curve[key]
+        elif key in config.sensor_calibration_linear:
+            _, _, i_zero, span = config.sensor_calibration_linear[key]
+        else:
+            i_zero, span = 4.0, 16.0
+        low.append(i_zero)
+        high.append(i_zero + span)
+    return np.array(low), np.array(high)
+
+
+class HealthScanner:
+    """Incremental fault scanner; feed raw mA blocks with update(), then finish()."""
+
+    def __init__(self, config=None, channels=None):
+        """
+        Args:
+            config: CalibrationConfig for the range limits (default: parameters.py)
+            channels: Channel column names (default: the 8 board channels)
+        """
+        self.channels = list(channels or BOARD_COLUMNS)
+        self.low, self.high = channel_limits(config, self.channels)
+        self._n = 0  # samples seen so far
+        self._tail = np.empty((0, len(self.channels)))  # context for rolling stats
+        self._open = {}  # (channel index, fault) -> start of a run still open at the block end
+        self._spike_n = 0  # samples with a spike decision so far
+        self._pending = np.empty((0, len(self.channels)), dtype=bool)  # other-fault mask of undecided samples
+
+    def update(self, block):
+        """
+        Scan the next block of samples.
+
+        Args:
+            block: (samples, channels) array of raw mA values
+
+        Returns:
+            list of closed runs (channel, fault, start, end), end exclusive
+        """
+        x = np.asarray(block, dtype=np.float64).reshape(-1, len(self.channels))
+        n = len(x)
+        if n == 0:
+            return []
+
+        finite = ~np.isnan(x)
+        no_signal = finite & (np.abs(x) < NO_SIGNAL_MA)
+        valid = finite & ~no_signal
+
+        prev = np.vstack([self._tail[-1:] if len(self._tail) else np.full((1, x.shape[1]), np.nan), x[:-1]])
+        masks = {
+            'no_signal': no_signal,
+            'over_range': valid & (x > self.high + RANGE_MARGIN_MA),
+            'under_range': valid & (x < self.low - RANGE_MARGIN_MA),
+            # marks samples equal to the previous one; widened to the whole run in _emit
+            'flatline': valid & (np.abs(x - prev) <= FLATLINE_EPS_MA),
+        }
+        other = masks['no_signal'] | masks['over_range'] | masks['under_range'] | masks['flatline']
+        spike, spike_offset = self._spikes(np.where(valid, x, np.nan), other)
+
+        offset = self._n
+        self._n += n
+        self._tail = np.vstack([self._tail, np.where(valid, x, np.nan)])[-3 * SPIKE_WINDOW:]
+
+        runs = []
+        for fault in FAULTS[:-1]:
+            runs.extend(self._runs(masks[fault], fault, offset))
+        if len(spike):
+            runs.extend(self._runs(spike, 'spike', spike_offset))
+        return sorted(runs, key=lambda r: (r[2], r[0]))
+
+    def finish(self):
+        """Decide the last spikes and close all runs still open at the end of the data."""
+        spike, spike_offset = self._spikes(np.empty((0, len(self.channels))), self._pending[:0], final=True)
+        runs = self._runs(spike, 'spike', spike_offset) if len(spike) else []
+        for (c, fault), start in sorted(self._open.items(), key=lambda kv: kv[1]):
+            runs.extend(self._emit(c, fault, start, self._n))
+        self._open = {}
+        return runs
+
+    def _spikes(self, x, other, final=False):
+        """
+        Robust outlier test over the tail context plus this block.
+
+        Returns:
+            (mask, start): spike mask of the samples decided now and the index
+            of the first of them; the last SPIKE_LAG samples wait for the
+            next block unless final
+        """
+        import pandas as pd
+
+        ctx = pd.DataFrame(np.vstack([self._tail, x]))
+        other = np.vstack([self._pending, other])
+        first = len(ctx) - len(other)
+        stop = len(ctx) if final else max(len(ctx) - SPIKE_LAG, first)
+        decided = slice(first, stop)
+
+        spike = (_outliers(ctx, center=False)[decided] & _outliers(ctx, center=True)[decided]
+                 & ~other[:stop - first])
+        self._pending = other[stop - first:]
+        start = self._spike_n
+        self._spike_n += stop - first
+        return spike, start
+
+    def _runs(self, mask, fault, offset):
+        """Run-length encode one fault mask, joining runs across block boundaries."""
+        n = len(mask)
+        runs = []
+        for c in range(mask.shape[1]):
+            padded = np.concatenate(([False], mask[:, c], [False])).astype(np.int8)
+            edges = np.flatnonzero(np.diff(padded))
+            open_start = self._open.pop((c, fault), None)
+            for s, e in zip(edges[0::2], edges[1::2]):
+                start = offset + int(s)
+                if s == 0 and open_start is not None:
+                    start, open_start = open_start, None
+                if e == n:
+                    self._open[(c, fault)] = start
+                else:
+                    runs.extend(self._emit(c, fault, start, offset + int(e)))
+            if open_start is not None:
+                runs.extend(self._emit(c, fault, open_start, offset))
+        return runs
+
+    def _emit(self, c, fault, start, end):
+        if fault == 'flatline':
+            # the first sample of a stuck section is not equal to its predecessor
+            start = max(start - 1, 0)
+            if end - start < FLATLINE_MIN_SAMPLES:
+                return []
+        return [(self.channels[c], fault, start, end)]
+
+
+def _outliers(ctx, center):
+    """Rolling median/MAD outlier mask of a DataFrame (trailing or centred windows)."""
+    min_periods = SPIKE_WINDOW // 2 + 1
+    med = ctx.rolling(SPIKE_WINDOW, min_periods=min_periods, center=center).median()
+    dev = (ctx - med).abs()
+    mad = dev.rolling(SPIKE_WINDOW, min_periods=min_periods, center=center).median()
+    scale = np.maximum(1.4826 * mad.to_numpy(), SPIKE_MIN_SCALE_MA)
+    return dev.to_numpy() > SPIKE_THRESHOLD * scale
+
+
+def scan_health(values, config=None, channels=None):
+    """
+    Scan a whole file in one pass.
+
+    Args:
+        values: (samples, channels) raw mA array or DataFrame of board columns
+        config: CalibrationConfig for the range limits
+        channels: Channel names (default: DataFrame columns or the 8 board channels)
+
+    Returns:
+        list of runs (channel, fault, start, end)
+    """
+    if hasattr(values, 'columns'):
+        channels = channels or list(values.columns)
+        values = values.to_numpy(dtype=np.float64)
+    scanner = HealthScanner(config, channels)
+    runs = scanner.update(values)
+    return runs + scanner.finish()
+
+
+def write_health_index(runs, path, append=False):
+    """Write runs as a compact CSV fault index (channel, fault, start, end, length)."""
+    import pandas as pd
+
+    df = pd.DataFrame(runs, columns=['channel', 'fault', 'start', 'end'])
+    df['length'] = df['end'] - df['start']
+    df.to_csv(path, mode='a' if append else 'w', header=not append, index=False)
+    return path
+
+
+def summarize_runs(runs):
+    """Return {fault: number of runs} for log messages."""
+    counts = {}
+    for _, fault, _, _ in runs:
+        counts[fault] = counts.get(fault, 0) + 1
+    return counts
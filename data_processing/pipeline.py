@@ -0,0 +1,549 @@
+"""
+Core CSV cleaning pipeline (filter → health scan → calibrate → timestamp check → save).
+
+This module has no UI dependencies and imports pandas/numpy only when a file is
+actually processed, so it can be used from the Streamlit apps, the command line
+(csv_cleaner_cli.py), pool workers, cron jobs and tests alike.
+"""
+import csv
+import io
+import os
+import re
+import shutil
+import time
+import traceback
+
+from calibration import InputProcessor
+
+BOARD_COLUMNS = [
+    'Board1_I0','Board1_I1','Board1_I2','Board1_I3',
+    'Board3_I0','Board3_I1','Board3_I2','Board3_I3'
+]
+
+
+def board_channel(col):
+    """Return (board_id, channel) for a column like 'Board1_I0'."""
+    board, channel = col.split('_')
+    return int(board.replace('Board','')), channel
+
+# Supported output formats and their file extensions
+OUTPUT_FORMATS = {'csv': '.csv', 'parquet': '.parquet'}
+
+# ============= Watch mode configs
+WATCH_POLL_INTERVAL = 1.0  # Seconds between folder scans (also inotify wait timeout)
+WATCH_STABLE_TIME = 30.0  # Seconds without growth before a file is finalized (pyramid built)
+
+
+def processed_folder_for(folder_path):
+    """Return (and create) the <folder>_Processed_Data output folder."""
+    root_name = os.path.basename(os.path.normpath(folder_path))
+    processed_folder = os.path.join(folder_path, f"{root_name}_Processed_Data")
+    os.makedirs(processed_folder, exist_ok=True)
+    return processed_folder
+
+
+def list_csv_files(folder_path):
+    """Return the CSV file names directly inside folder_path."""
+    return [f for f in os.listdir(folder_path) if f.lower().endswith('.csv')]
+
+
+def parse_setpoints(file_name):
+    """Return (alicat_val, vfd_val) parsed from the file name, or None."""
+    alicat_m = re.search(r'AliCat(\d+\.\d+)', file_name)
+    vfd_m    = re.search(r'VFD(\d+\.\d+)', file_name)
+    if alicat_m and vfd_m:
+        return float(alicat_m.group(1)), float(vfd_m.group(1))
+    return None
+
+
+def setpoints_from_columns(df):
+    """Return (alicat_val, vfd_val) from the first row of AliCat/VFD columns, or None."""
+    al_cols = [c for c in df.columns if re.search(r'AliCat', c, re.IGNORECASE)]
+    vfd_cols= [c for c in df.columns if re.search(r'VFD', c, re.IGNORECASE)]
+    if not al_cols or not vfd_cols:
+        return None
+    return df[al_cols[0]].iloc[0], df[vfd_cols[0]].iloc[0]
+
+
+def filter_rows(df, file_name, alicat_val, vfd_val):
+    """Keep rows matching the indicator and setpoints."""
+    if re.search(r'A_(\d+\.\d+)', file_name):
+        df = df[df['indicator'] == 1]
+    else:
+        df = df[df['indicator'] == 0]
+
+    tol = 0.01
+    df = df[
+        (df['AliCat_Output'].sub(alicat_val).abs() < tol) &
+        (df['VFD_Output'].sub(vfd_val).abs() < tol)
+    ]
+    return df
+
+
+def calibrate_boards(df, input_processor):
+    """Scale the board channels from mA to engineering units."""
+    for col in BOARD_COLUMNS:
+        board, channel = board_channel(col)
+        df[col] = df[col].apply(
+            lambda x: input_processor.scale_input(board, channel, x)[0]
+        )
+    return df
+
+
+def filter_and_calibrate(df, file_name, alicat_val, vfd_val, input_processor):
+    """Keep rows matching the indicator and setpoints, then scale the board channels."""
+    df = filter_rows(df, file_name, alicat_val, vfd_val)
+    return calibrate_boards(df, input_processor)
+
+
+def check_timestamps(df, t0=None, prev_elapsed=None):
+    """
+    Parse Timestamp, add Elapsed_s and find rows where time goes backwards.
+
+    Args:
+        df: Filtered DataFrame with a 'Timestamp' column
+        t0: Reference timestamp (default: first row of df)
+        prev_elapsed: Elapsed_s of the last row of the previous block, if any
+
+    Returns:
+        tuple: (t0, list of row labels where the timestamp decreased)
+    """
+    import pandas as pd
+
+    df['Timestamp'] = pd.to_datetime(df['Timestamp'], errors='coerce')
+    if t0 is None:
+        t0 = df['Timestamp'].iloc[0]
+
+    df['Elapsed_s'] = (df['Timestamp'] - t0).dt.total_seconds()
+    diffs = df['Elapsed_s'].diff()
+    if prev_elapsed is not None and len(df):
+        diffs.iloc[0] = df['Elapsed_s'].iloc[0] - prev_elapsed
+    neg = diffs.dropna() < 0
+    return t0, neg[neg].index.tolist()
+
+
+def parquet_engine_available():
+    """Return True if pandas can write Parquet (pyarrow or fastparquet installed)."""
+    import importlib.util
+
+    return any(importlib.util.find_spec(m) is not None for m in ('pyarrow', 'fastparquet'))
+
+
+def check_output_format(output_format):
+    """Raise ValueError if output_format is unknown or cannot be written here."""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    if output_format == 'parquet' and not parquet_engine_available():
+        raise ValueError("Parquet output needs pyarrow or fastparquet (pip install pyarrow)")
+
+
+def write_output(df, out_path, output_format='csv'):
+    """Write a processed DataFrame as CSV or Parquet (Parquet needs pyarrow)."""
+    if output_format == 'csv':
+        df.to_csv(out_path, index=False)
+    elif output_format == 'parquet':
+        df.to_parquet(out_path, index=False)
+    else:
+        raise ValueError(f"Unsupported output format: {output_format}")
+
+
+def process_csv_file(file_path, processed_folder, log_fn, input_processor, output_format='csv'):
+    """Process a single source CSV into processed_folder, writing status messages via log_fn."""
+    import pandas as pd
+    from data_processing.decimation import build_pyramid_for_csv
+    from data_processing.health import HEALTH_SUFFIX, scan_health, summarize_runs, write_health_index
+
+    file_name = os.path.basename(file_path)
+    log_fn(f"\n**Processing {file_name}**…")
+
+    try:
+        # 1) Try filename parse
+        setpoints = parse_setpoints(file_name)
+        if setpoints is None:
+            log_fn("\n  ✗ No AliCat/VFD in filename — falling back to file contents…")
+            setpoints = setpoints_from_columns(pd.read_csv(file_path))
+            if setpoints is None:
+                log_fn("\n  ✗ Skipping — no AliCat or VFD in columns or filename")
+                return
+            log_fn(f"\n  ✓ Found in columns: AliCat={setpoints[0]}, VFD={setpoints[1]}")
+        alicat_val, vfd_val = setpoints
+
+        # read & filter
+        df = pd.read_csv(file_path)
+        orig_rows = len(df)
+        df = filter_rows(df, file_name, alicat_val, vfd_val)
+
+        # sensor health scan on the raw mA values, then calibrate
+        faults = scan_health(df[BOARD_COLUMNS], input_processor.config)
+        df = calibrate_boards(df, input_processor)
+
+        # timestamp check
+        error_flag = False
+        if 'Timestamp' in df.columns:
+            _, idx = check_timestamps(df)
+            if idx:
+                error_flag = True
+                log_fn(f"\n  ✗ Signal Error: {file_name}")
+                log_fn(f"\n  ✗ Decrease detected at rows: {idx}")
+            else:
+                log_fn("\n  ✔ All timestamps strictly increasing")
+
+        # save
+        base, _ = os.path.splitext(file_name)
+        suffix = "_Processed_Signal_Error" if error_flag else "_Processed"
+        out_name = f"{base}{suffix}{OUTPUT_FORMATS[output_format]}"
+        out_path = os.path.join(processed_folder, out_name)
+        write_output(df, out_path, output_format)
+        log_fn(f"\n  ✓ Complete: Kept {len(df)} / {orig_rows} rows → `{out_name}`")
+
+        health_path = os.path.join(processed_folder, f"{base}{suffix}{HEALTH_SUFFIX}")
+        write_health_index(faults, health_path)
+        if faults:
+            log_fn(f"\n  ✗ Sensor faults: {summarize_runs(faults)} → `{os.path.basename(health_path)}`")
+        else:
+            log_fn("\n  ✔ No sensor faults detected")
+
+        # decimation pyramid for fast plotting of long runs
+        try:
+            pyr_path = build_pyramid_for_csv(df, out_path, BOARD_COLUMNS)
+            log_fn(f"\n  ✓ Pyramid saved → `{os.path.basename(pyr_path)}`")
+        except Exception as e:
+            log_fn(f"\n  ✗ Pyramid failed: {e}")
+
+    except Exception as e:
+        base, ext = os.path.splitext(file_name)
+        err_name = f"{base}_File_Error{ext}"
+        err_path = os.path.join(processed_folder, err_name)
+        shutil.copy2(file_path, err_path)
+        log_fn(f"\n  ✗ Error: {e} → saved original as `{err_name}`")
+        log_fn(traceback.format_exc())
+
+# --------------------------------------------------------------------------
+# Batch processing (optionally across a process pool)
+# --------------------------------------------------------------------------
+
+# One InputProcessor per pool worker, created by _init_worker
+_worker_processor = None
+
+
+def _init_worker(config):
+    global _worker_processor
+    _worker_processor = InputProcessor(config)
+
+
+def _process_file_in_worker(file_path, processed_folder, output_format):
+    """Pool task: process one file and return its status messages."""
+    messages = []
+    process_csv_file(file_path, processed_folder, messages.append, _worker_processor, output_format)
+    return messages
+
+
+def process_csv_folder(folder_path, log_fn, workers=1, output_format='csv', config=None,
+                       log_header=True):
+    """
+    Process all CSVs in folder_path, writing status messages via log_fn.
+
+    Args:
+        folder_path: Folder containing the source CSVs
+        log_fn: Callable receiving status messages
+        workers: Number of worker processes (1 = process in this process)
+        output_format: 'csv' or 'parquet'
+        config: CalibrationConfig (default: values from parameters.py)
+        log_header: Log the "Found N CSV files" line (False if the caller shows its own)
+    """
+    # Checked up front: a missing Parquet engine would otherwise fail every
+    # file and copy each source as a _File_Error.csv
+    check_output_format(output_format)
+
+    csv_files = list_csv_files(folder_path)
+    if log_header:
+        log_fn(f"Found {len(csv_files)} CSV files to process in:\n  {folder_path}")
+
+    processed_folder = processed_folder_for(folder_path)
+    file_paths = [os.path.join(folder_path, f) for f in csv_files]
+
+    if workers > 1 and len(file_paths) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(config,)) as pool:
+            results = pool.map(
+                _process_file_in_worker,
+                file_paths,
+                [processed_folder] * len(file_paths),
+                [output_format] * len(file_paths),
+            )
+            # messages are replayed in file order as each file completes
+            for messages in results:
+                for msg in messages:
+                    log_fn(msg)
+    else:
+        input_processor = InputProcessor(config)
+        for file_path in file_paths:
+            process_csv_file(file_path, processed_folder, log_fn, input_processor, output_format)
+
+    log_fn("\n All files processed!")
+
+# --------------------------------------------------------------------------
+# Watch mode: incremental processing of growing CSVs
+# --------------------------------------------------------------------------
+
+class _TailState:
+    """Per-file progress of the watch loop."""
+
+    def __init__(self, file_name, processed_folder, config=None):
+        from data_processing.health import HealthScanner
+
+        self.file_name = file_name
+        self.offset = 0            # bytes of the source file already consumed
+        self.size = 0              # file size seen on the previous scan
+        self.columns = None        # header of the source file
+        self.setpoints = None      # (alicat_val, vfd_val)
+        self.rows_read = 0         # source rows consumed (for row numbers in messages)
+        self.rows_kept = 0
+        self.t0 = None             # first timestamp kept
+        self.prev_elapsed = None   # Elapsed_s of the last row written
+        self.error_flag = False
+        self.last_growth = time.monotonic()
+        self.finalized = False
+        self.health = HealthScanner(config)
+        self.health_written = False
+
+        base, ext = os.path.splitext(file_name)
+        self.processed_folder = processed_folder
+        self.base, self.ext = base, ext
+        self.out_path = self._out_path("_Processed")
+        self.health_path = self._out_path("_Processed", health=True)
+
+    def _out_path(self, suffix, health=False):
+        from data_processing.health import HEALTH_SUFFIX
+
+        ext = HEALTH_SUFFIX if health else self.ext
+        return os.path.join(self.processed_folder, f"{self.base}{suffix}{ext}")
+
+    def mark_signal_error(self):
+        """Move the outputs to the _Processed_Signal_Error names and keep appending there."""
+        if self.error_flag:
+            return
+        self.error_flag = True
+        for attr, health in (('out_path', False), ('health_path', True)):
+            new_path = self._out_path("_Processed_Signal_Error", health)
+            if os.path.exists(getattr(self, attr)):
+                os.replace(getattr(self, attr), new_path)
+            setattr(self, attr, new_path)
+
+    def write_faults(self, runs, log_fn):
+        """
+        Append closed fault runs to the health index. The index is created
+        with the first kept rows even without faults, as in batch mode.
+        """
+        from data_processing.health import summarize_runs, write_health_index
+
+        if self.health_written and not runs:
+            return
+        write_health_index(runs, self.health_path, append=self.health_written)
+        self.health_written = True
+        if runs:
+            log_fn(f"\n  ✗ {self.file_name} sensor faults: {summarize_runs(runs)}")
+
+
+def read_new_lines(file_path, state, final=False):
+    """
+    Return the complete lines appended since state.offset and advance it.
+
+    With final=True a trailing line without a newline is returned as well
+    (terminated with one), for files whose writer has finished.
+    """
+    with open(file_path, 'rb') as f:
+        f.seek(state.offset)
+        data = f.read()
+    if final and data and not data.endswith(b'\n'):
+        state.offset += len(data)
+        return data + b'\n'
+    end = data.rfind(b'\n')
+    if end < 0:
+        return b''
+    state.offset += end + 1
+    return data[:end + 1]
+
+
+def _split_bad_lines(text, n_fields):
+    """Return (good lines, their positions, positions of lines without n_fields fields)."""
+    lines = [line for line in text.splitlines() if line.strip()]
+    good, good_pos, bad_pos = [], [], []
+    for pos, line in enumerate(lines):
+        # one reader per line, so a stray quote cannot swallow the next lines
+        if len(next(csv.reader([line]))) == n_fields:
+            good.append(line)
+            good_pos.append(pos)
+        else:
+            bad_pos.append(pos)
+    return good, good_pos, bad_pos
+
+
+def process_new_rows(file_path, state, input_processor, log_fn, final=False):
+    """
+    Run the cleaning pipeline on rows appended to file_path since the last call.
+
+    final=True also takes a last line that has no trailing newline.
+    """
+    import pandas as pd
+
+    data = read_new_lines(file_path, state, final)
+    if not data:
+        return 0
+
+    if state.columns is None:
+        header, _, data = data.partition(b'\n')
+        state.columns = list(pd.read_csv(io.BytesIO(header + b'\n'), nrows=0).columns)
+        if not data:
+            return 0
+
+    # Malformed lines (a torn write, a glitch on the drive) must only cost
+    # those lines, not the whole block: lines with the wrong number of fields
+    # and rows whose numeric fields do not parse are skipped and reported
+    # with their data row number in the source file.
+    lines, good_pos, bad_pos = _split_bad_lines(data.decode('utf-8', errors='replace'), len(state.columns))
+    first_row = state.rows_read
+    state.rows_read += len(good_pos) + len(bad_pos)
+    skipped = [first_row + pos for pos in bad_pos]
+
+    if lines:
+        df = pd.read_csv(io.StringIO("\n".join(lines) + "\n"), header=None, names=state.columns)
+    else:
+        df = pd.DataFrame(columns=state.columns)
+    df.index = [first_row + pos for pos in good_pos]
+
+    numeric = [c for c in BOARD_COLUMNS + ['AliCat_Output', 'VFD_Output', 'indicator'] if c in df.columns]
+    df[numeric] = df[numeric].apply(pd.to_numeric, errors='coerce')
+    bad = df[numeric].isna().any(axis=1)
+    skipped = sorted(skipped + bad[bad].index.tolist())
+    if skipped:
+        log_fn(f"\n  ✗ {state.file_name}: skipped {len(skipped)} malformed rows: {skipped}")
+        df = df[~bad]
+    if df.empty:
+        return 0
+
+    if state.setpoints is None:
+        state.setpoints = parse_setpoints(state.file_name) or setpoints_from_columns(df)
+        if state.setpoints is None:
+            raise ValueError("no AliCat or VFD in columns or filename")
+
+    alicat_val, vfd_val = state.setpoints
+    df = filter_rows(df, state.file_name, alicat_val, vfd_val)
+    if df.empty:
+        return 0
+    state.write_faults(state.health.update(df[BOARD_COLUMNS].to_numpy(dtype=float)), log_fn)
+    df = calibrate_boards(df, input_processor)
+
+    if 'Timestamp' in df.columns:
+        state.t0, idx = check_timestamps(df, state.t0, state.prev_elapsed)
+        state.prev_elapsed = df['Elapsed_s'].iloc[-1]
+        if idx:
+            state.mark_signal_error()
+            log_fn(f"\n  ✗ Signal Error: {state.file_name}")
+            log_fn(f"\n  ✗ Decrease detected at rows: {idx}")
+
+    write_header = state.rows_kept == 0
+    df.to_csv(state.out_path, mode='w' if write_header else 'a', header=write_header, index=False)
+    state.rows_kept += len(df)
+    return len(df)
+
+
+def _finalize(state, log_fn):
+    """Build the pyramid once a watched file has stopped growing."""
+    import pandas as pd
+    from data_processing.decimation import build_pyramid_for_csv
+
+    state.finalized = True
+    if state.rows_kept == 0:
+        return
+    state.write_faults(state.health.finish(), log_fn)
+    try:
+        df = pd.read_csv(state.out_path)
+        pyr_path = build_pyramid_for_csv(df, state.out_path, BOARD_COLUMNS)
+        log_fn(f"\n  ✓ {state.file_name} stable — pyramid saved → `{os.path.basename(pyr_path)}`")
+    except Exception as e:
+        log_fn(f"\n  ✗ Pyramid failed for {state.file_name}: {e}")
+
+
+def _open_inotify(folder_path):
+    """Return an inotify watcher on folder_path, or None to fall back to polling."""
+    try:
+        from inotify_simple import INotify, flags
+    except ImportError:
+        return None
+    try:
+        watcher = INotify()
+        watcher.add_watch(folder_path, flags.MODIFY | flags.CLOSE_WRITE | flags.CREATE | flags.MOVED_TO)
+        return watcher
+    except OSError:
+        return None
+
+
+def watch_csv_folder(folder_path, log_fn, poll_interval=WATCH_POLL_INTERVAL,
+                     stable_time=WATCH_STABLE_TIME, stop_fn=None, config=None):
+    """
+    Continuously process new and growing CSVs in folder_path.
+
+    Each file is read from the byte offset where the previous pass stopped, so
+    only newly appended complete rows go through filter/calibrate/timestamp and
+    are appended to the processed output. Changes are picked up with inotify
+    (inotify_simple) when available, otherwise by polling every poll_interval.
+
+    Args:
+        folder_path: Folder containing the source CSVs
+        log_fn: Callable receiving status messages
+        poll_interval: Seconds between scans (inotify wait timeout)
+        stable_time: Seconds without growth before the pyramid is built
+        stop_fn: Optional callable; the loop exits when it returns True
+        config: CalibrationConfig (default: values from parameters.py)
+    """
+    input_processor = InputProcessor(config)
+    processed_folder = processed_folder_for(folder_path)
+
+    watcher = _open_inotify(folder_path)
+    mode = "inotify" if watcher is not None else f"polling every {poll_interval}s"
+    log_fn(f"Watching {folder_path} ({mode})")
+
+    states = {}
+    while stop_fn is None or not stop_fn():
+        now = time.monotonic()
+        for file_name in list_csv_files(folder_path):
+            file_path = os.path.join(folder_path, file_name)
+            try:
+                size = os.path.getsize(file_path)
+            except OSError:
+                continue
+
+            state = states.get(file_name)
+            if state is None or size < state.size:
+                # new file, or truncated/replaced: start over
+                state = states[file_name] = _TailState(file_name, processed_folder, config)
+                log_fn(f"\n**Watching {file_name}**…")
+
+            # Growth is judged on the size seen last time, not on the offset:
+            # a last line still missing its newline keeps size > offset.
+            grew = size != state.size
+            stable = not grew and not state.finalized and now - state.last_growth >= stable_time
+            if grew or stable:
+                try:
+                    # once stable, also take a last line without a newline
+                    kept = process_new_rows(file_path, state, input_processor, log_fn, final=stable)
+                    if kept:
+                        log_fn(f"\n  ✓ {file_name}: +{kept} rows ({state.rows_kept} total)")
+                except Exception as e:
+                    log_fn(f"\n  ✗ Error in {file_name}: {e}")
+                    log_fn(traceback.format_exc())
+                    # state.offset already points past the last complete line
+                    # read, so tailing resumes at a row boundary
+            if grew:
+                state.size = size
+                state.last_growth = now
+                state.finalized = False
+            elif stable:
+                _finalize(state, log_fn)
+
+        if watcher is not None:
+            watcher.read(timeout=int(poll_interval * 1000))
+        else:
+            time.sleep(poll_interval)
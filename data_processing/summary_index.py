@@ -0,0 +1,276 @@
+"""
+Cross-experiment setpoint summary index.
+
+Walks one or more *_Processed_Data folders in parallel and, for every file and
+setpoint (AliCat, VFD, indicator, WATERCUT), computes per-channel count, mean,
+std, percentiles and no-signal fraction in a single streaming pass:
+
+- mean/std use mergeable moments (count, mean, M2) combined chunk by chunk,
+- percentiles come from a fixed-bin histogram over the channel's calibrated
+  range, which is also mergeable and needs no second pass.
+
+Results go into an SQLite index that is updated incrementally: files whose
+size and mtime are unchanged are skipped, and rows of removed files are dropped.
+"""
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from calibration import NO_SIGNAL_VALUE, CalibrationConfig
+from data_processing.dataset import find_processed_files, parse_watercut
+from data_processing.pipeline import BOARD_COLUMNS, board_channel, parse_setpoints
+
+INDEX_FILENAME = "summary_index.sqlite"
+PERCENTILES = (5, 25, 50, 75, 95)
+HISTOGRAM_BINS = 2048
+CHUNK_ROWS = 100_000
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime REAL
+);
+CREATE TABLE IF NOT EXISTS summary (
+    path TEXT,
+    alicat REAL,
+    vfd REAL,
+    indicator INTEGER,
+    watercut REAL,
+    channel TEXT,
+    count INTEGER,
+    mean REAL,
+    std REAL,
+    {", ".join(f"p{p:02d} REAL" for p in PERCENTILES)},
+    no_signal_frac REAL
+);
+CREATE INDEX IF NOT EXISTS summary_setpoint ON summary (alicat, vfd, indicator, watercut, channel);
+CREATE INDEX IF NOT EXISTS summary_path ON summary (path);
+"""
+
+
+def channel_ranges(config=None):
+    """Return {column: (low, high)} histogram ranges from the calibration tables."""
+    config = config or CalibrationConfig.from_parameters()
+    ranges = {}
+    for col in BOARD_COLUMNS:
+        key = board_channel(col)
+        if key in config.sensor_calibration_curve:
+            high = config.sensor_calibration_curve[key][2]
+        elif key in config.sensor_calibration_linear:
+            high = config.sensor_calibration_linear[key][1]
+        else:
+            high = 20.0  # raw mA
+        ranges[col] = (0.0, float(high) * 1.1)
+    return ranges
+
+
+class _ChannelStats:
+    """Mergeable single-pass statistics of one channel."""
+
+    def __init__(self, low, high):
+        self.low, self.high = low, high
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.no_signal = 0
+        self.hist = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+
+    def update(self, values):
+        values = values[~np.isnan(values)]
+        no_signal = values == NO_SIGNAL_VALUE
+        self.no_signal += int(no_signal.sum())
+        values = values[~no_signal]
+        n_b = len(values)
+        if n_b == 0:
+            return
+
+        # Chan et al. parallel combination of (n, mean, M2)
+        mean_b = float(values.mean())
+        m2_b = float(((values - mean_b) ** 2).sum())
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta * delta * self.n * n_b / n
+        self.n = n
+
+        bins = ((values - self.low) / (self.high - self.low) * HISTOGRAM_BINS).astype(np.int64)
+        self.hist += np.bincount(np.clip(bins, 0, HISTOGRAM_BINS - 1), minlength=HISTOGRAM_BINS)
+
+    def percentiles(self):
+        if self.n == 0:
+            return [np.nan] * len(PERCENTILES)
+        cdf = np.cumsum(self.hist)
+        width = (self.high - self.low) / HISTOGRAM_BINS
+        out = []
+        for p in PERCENTILES:
+            target = p / 100.0 * self.n
+            b = int(np.searchsorted(cdf, target, side='left'))
+            before = cdf[b - 1] if b > 0 else 0
+            frac = (target - before) / self.hist[b] if self.hist[b] else 0.0
+            out.append(self.low + (b + frac) * width)
+        return out
+
+    def row(self):
+        total = self.n + self.no_signal
+        std = float(np.sqrt(self.m2 / (self.n - 1))) if self.n > 1 else np.nan
+        return [
+            self.n,
+            self.mean if self.n else np.nan,
+            std,
+            *self.percentiles(),
+            self.no_signal / total if total else np.nan,
+        ]
+
+
+def summarize_file(path, ranges, watercut=None):
+    """
+    Stream one processed file and return its summary rows.
+
+    The AliCat/VFD setpoint is the file's own (parsed from the file name,
+    falling back to the first row of AliCat_Output/VFD_Output), the same
+    labelling dataset.py uses; rows are only split further by indicator.
+
+    Returns:
+        list of tuples matching the summary table columns
+    """
+    import pandas as pd
+
+    usecols = set(BOARD_COLUMNS) | {'AliCat_Output', 'VFD_Output', 'indicator'}
+    wc = parse_watercut(path, watercut)
+    setpoints = parse_setpoints(os.path.basename(path))
+    groups = {}
+
+    if path.lower().endswith('.parquet'):
+        chunks = [pd.read_parquet(path)]
+    else:
+        chunks = pd.read_csv(path, usecols=lambda c: c in usecols, chunksize=CHUNK_ROWS)
+
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        if setpoints is None:
+            setpoints = (chunk['AliCat_Output'].iloc[0], chunk['VFD_Output'].iloc[0])
+        indicator = chunk['indicator'] if 'indicator' in chunk.columns else pd.Series(-1, index=chunk.index)
+        for key, rows in chunk.groupby(indicator).indices.items():
+            stats = groups.get(key)
+            if stats is None:
+                stats = groups[key] = {c: _ChannelStats(*ranges[c]) for c in BOARD_COLUMNS if c in chunk.columns}
+            for col, s in stats.items():
+                s.update(chunk[col].to_numpy(dtype=np.float64)[rows])
+
+    out = []
+    for indicator, stats in groups.items():
+        for col, s in stats.items():
+            out.append((path, float(setpoints[0]), float(setpoints[1]), int(indicator), wc, col, *s.row()))
+    return out
+
+
+def _summarize_task(args):
+    path, ranges, watercut = args
+    return path, summarize_file(path, ranges, watercut)
+
+
+def update_summary_index(folders, log_fn, index_path=None, workers=None, config=None, watercut=None):
+    """
+    Add new or changed processed files to the summary index.
+
+    Args:
+        folders: *_Processed_Data folder or list of folders
+        log_fn: Callable receiving status messages
+        index_path: SQLite file (default: summary_index.sqlite in the first folder)
+        workers: Worker processes (default: os.cpu_count())
+        config: CalibrationConfig used for histogram ranges
+        watercut: WATERCUT used when a path has no WC tag (default: parameters.WATERCUT)
+
+    Returns:
+        str: index_path
+    """
+    if isinstance(folders, (str, os.PathLike)):
+        folders = [folders]
+    index_path = index_path or os.path.join(folders[0], INDEX_FILENAME)
+    ranges = channel_ranges(config)
+
+    con = sqlite3.connect(index_path)
+    try:
+        con.executescript(_SCHEMA)
+        known = {p: (s, m) for p, s, m in con.execute("SELECT path, size, mtime FROM files")}
+
+        # paths are stored absolute so relative and absolute runs share rows
+        current = {}
+        for path in find_processed_files(folders, include_signal_error=True):
+            path = os.path.abspath(path)
+            st = os.stat(path)
+            current[path] = (st.st_size, st.st_mtime)
+
+        todo = [p for p, sig in current.items() if known.get(p) != sig]
+        scanned = {os.path.abspath(f) for f in folders}
+        removed = [p for p in known if p not in current and os.path.dirname(os.path.abspath(p)) in scanned]
+        log_fn(f"Summary index: {len(todo)} new/changed, {len(removed)} removed, "
+               f"{len(current) - len(todo)} unchanged")
+
+        with con:
+            for p in removed:
+                con.execute("DELETE FROM summary WHERE path = ?", (p,))
+                con.execute("DELETE FROM files WHERE path = ?", (p,))
+
+        placeholders = ", ".join("?" * (10 + len(PERCENTILES)))
+        tasks = [(p, ranges, watercut) for p in todo]
+        if workers == 1 or len(tasks) <= 1:
+            results = map(_summarize_task, tasks)
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            results = pool.map(_summarize_task, tasks)
+
+        try:
+            for path, rows in results:
+                with con:
+                    con.execute("DELETE FROM summary WHERE path = ?", (path,))
+                    con.executemany(f"INSERT INTO summary VALUES ({placeholders})", rows)
+                    con.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (path, *current[path]))
+                log_fn(f"  ✓ {os.path.basename(path)}: {len(rows)} channel summaries")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+    finally:
+        con.close()
+
+    return index_path
+
+
+def query_summary(index_path, channel=None, alicat=None, vfd=None, indicator=None, watercut=None, tol=0.01):
+    """
+    Return matching summary rows as a DataFrame.
+
+    Args:
+        index_path: SQLite file written by update_summary_index
+        channel: Channel column (e.g. 'Board1_I0'); None = all
+        alicat, vfd, watercut: Setpoint values matched within tol; None = any
+        indicator: 0 or 1; None = any
+    """
+    import pandas as pd
+
+    clauses, params = [], []
+    if channel is not None:
+        clauses.append("channel = ?")
+        params.append(channel)
+    if indicator is not None:
+        clauses.append("indicator = ?")
+        params.append(int(indicator))
+    for name, value in (('alicat', alicat), ('vfd', vfd), ('watercut', watercut)):
+        if value is not None:
+            clauses.append(f"ABS({name} - ?) < ?")
+            params.extend([float(value), tol])
+
+    sql = "SELECT * FROM summary"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+
+    con = sqlite3.connect(index_path)
+    try:
+        return pd.read_sql_query(sql, con, params=params)
+    finally:
+        con.close()
@@ -0,0 +1,415 @@
+"""
+Staged live acquisition pipeline: acquisition → calibration → logging, plus
+throttled display sinks.
+
+Each stage runs in its own thread:
+
+- acquisition reads ADC blocks and hands them to calibration,
+- calibration scales every block, publishes it as the latest snapshot and
+  hands it to logging,
+- logging writes every calibrated block,
+- each display sink wakes at its own interval (GUI_UPDATE_INTERVAL,
+  BAR_UPDATE_INTERVAL, ...) and renders only the latest snapshot, so a slow
+  UI coalesces blocks instead of queueing them.
+
+No stage ever waits on the next one, so a slow disk cannot hold back
+acquisition or the latest snapshot. Each hand-off keeps up to
+PIPELINE_QUEUE_SIZE blocks in memory; further blocks spill to a temporary
+file in PIPELINE_SPILL_DIR (or, without one, to an in-memory overflow) and
+are read back in order. queue_overflow and spilled in the metrics show it.
+
+Blocks are never discarded: a block whose calibration fails, or whose
+log_block call still fails after LOG_RETRIES attempts, is moved to the dead
+letters (dead_letter_path, or LivePipeline.dead_letters without a path) and
+its traceback goes to log_fn.
+"""
+import json
+import pickle
+import tempfile
+import threading
+import time
+import traceback
+from collections import deque
+
+from calibration import InputProcessor
+from parameters import GUI_UPDATE_INTERVAL, PIPELINE_QUEUE_SIZE, PIPELINE_SPILL_DIR
+
+_STOP = object()  # returned by _SpillQueue.get() once the queue is closed and empty
+
+LOG_RETRIES = 3  # log_block attempts per block before it becomes a dead letter
+LOG_RETRY_DELAY = 0.1  # seconds before the first log_block retry, doubled per attempt
+READ_RETRY_DELAY = 0.01  # seconds after the first failed read_block, doubled per failure
+READ_RETRY_MAX_DELAY = 1.0  # cap of the read_block backoff
+
+
+class Block:
+    """One ADC block as it moves through the pipeline."""
+
+    __slots__ = ('seq', 't_acquired', 'raw', 'values', 'units')
+
+    def __init__(self, seq, t_acquired, raw):
+        self.seq = seq
+        self.t_acquired = t_acquired  # time.monotonic() when the block was read
+        self.raw = raw                # {(board_id, channel): [mA, ...]}
+        self.values = None            # {(board_id, channel): [scaled, ...]}
+        self.units = None             # {(board_id, channel): unit}
+
+
+class StageMetrics:
+    """Thread-safe counters of one stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self.count = 0
+        self.busy_s = 0.0       # time spent in the stage function
+        self.latency_sum = 0.0  # acquisition → end of this stage
+        self.latency_max = 0.0
+        self.coalesced = 0      # blocks skipped by a display sink
+        self.errors = 0
+        self.retries = 0        # repeated attempts after an error
+        self.dead_letters = 0   # blocks moved to the dead letters
+
+    def record(self, busy, latency, coalesced=0):
+        with self._lock:
+            self.count += 1
+            self.busy_s += busy
+            self.latency_sum += latency
+            self.latency_max = max(self.latency_max, latency)
+            self.coalesced += coalesced
+
+    def add_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def add_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def add_dead_letter(self):
+        with self._lock:
+            self.dead_letters += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'count': self.count,
+                'busy_s': self.busy_s,
+                'latency_mean_s': self.latency_sum / self.count if self.count else 0.0,
+                'latency_max_s': self.latency_max,
+                'coalesced': self.coalesced,
+                'errors': self.errors,
+                'retries': self.retries,
+                'dead_letters': self.dead_letters,
+            }
+
+
+class _DiskFifo:
+    """FIFO of pickled items in an anonymous temporary file."""
+
+    def __init__(self, spill_dir):
+        self._f = tempfile.TemporaryFile(dir=spill_dir, prefix="live_spill_")
+        self._read = 0  # file position of the oldest item
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def append(self, item):
+        self._f.seek(0, 2)
+        pickle.dump(item, self._f, pickle.HIGHEST_PROTOCOL)
+        self._n += 1
+
+    def popleft(self):
+        self._f.seek(self._read)
+        item = pickle.load(self._f)
+        self._read = self._f.tell()
+        self._n -= 1
+        if self._n == 0:  # drained: reuse the file from the start
+            self._f.seek(0)
+            self._f.truncate()
+            self._read = 0
+        return item
+
+
+class _SpillQueue:
+    """
+    FIFO between two stages whose put() never blocks.
+
+    Up to capacity items are kept in memory; once it is full, items go to the
+    overflow (a _DiskFifo in spill_dir, or an unbounded deque without one)
+    until the overflow has drained again, so the order is kept.
+    """
+
+    def __init__(self, capacity, spill_dir=None):
+        self.capacity = capacity
+        self._mem = deque()
+        self._overflow = _DiskFifo(spill_dir) if spill_dir else deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.max_depth = 0
+        self.spilled = 0
+
+    def put(self, item):
+        with self._cond:
+            if not self._overflow and len(self._mem) < self.capacity:
+                self._mem.append(item)
+            else:
+                self._overflow.append(item)
+                self.spilled += 1
+            self.max_depth = max(self.max_depth, len(self._mem) + len(self._overflow))
+            self._cond.notify()
+
+    def close(self):
+        """Mark the end of the stream; get() returns _STOP once the queue is empty."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def get(self):
+        with self._cond:
+            while not self._mem and not self._overflow:
+                if self._closed:
+                    return _STOP
+                self._cond.wait()
+            return self._mem.popleft() if self._mem else self._overflow.popleft()
+
+    def depth(self):
+        with self._cond:
+            return len(self._mem) + len(self._overflow)
+
+    def overflow(self):
+        """Number of queued items beyond the in-memory capacity."""
+        with self._cond:
+            return len(self._overflow)
+
+
+class LivePipeline:
+    """Acquisition, calibration, logging and display decoupled by non-blocking queues."""
+
+    def __init__(self, read_block, log_block=None, input_processor=None, calibration=True,
+                 queue_size=PIPELINE_QUEUE_SIZE, log_fn=None, dead_letter_path=None,
+                 spill_dir=PIPELINE_SPILL_DIR):
+        """
+        Args:
+            read_block: Callable returning the next raw block
+                        {(board_id, channel): [mA, ...]}, or None at end of stream
+            log_block: Optional callable receiving every calibrated Block
+            input_processor: InputProcessor used for scaling (default: parameters.py calibration)
+            calibration: Passed to InputProcessor.scale_input
+            queue_size: Blocks kept in memory per inter-stage queue
+            log_fn: Callable receiving error messages with tracebacks (default: print)
+            dead_letter_path: Optional JSON-lines file for blocks that could not be
+                              calibrated or logged (default: kept in dead_letters)
+            spill_dir: Folder for blocks beyond queue_size (None = in-memory overflow)
+        """
+        self.read_block = read_block
+        self.log_block = log_block
+        self.input_processor = input_processor or InputProcessor()
+        self.calibration = calibration
+        self.log_fn = log_fn or print
+        self.dead_letter_path = dead_letter_path
+        self.dead_letters = []  # (stage, Block) not written to dead_letter_path
+        self._dead_lock = threading.Lock()
+
+        self._calib_q = _SpillQueue(queue_size, spill_dir)
+        self._log_q = _SpillQueue(queue_size, spill_dir) if log_block is not None else None
+        self._stop = threading.Event()
+        self._latest = None
+        self._latest_lock = threading.Lock()
+        self._displays = []
+        self._threads = []
+
+        self._metrics = {
+            'acquisition': StageMetrics('acquisition'),
+            'calibration': StageMetrics('calibration'),
+        }
+        if log_block is not None:
+            self._metrics['logging'] = StageMetrics('logging')
+
+    def add_display(self, render, interval=GUI_UPDATE_INTERVAL, name=None):
+        """
+        Register a display sink rendering the latest Block every interval seconds.
+
+        Args:
+            render: Callable receiving the latest calibrated Block
+            interval: Refresh interval in seconds (e.g. GUI_UPDATE_INTERVAL, BAR_UPDATE_INTERVAL)
+            name: Metrics name (default: display<N>)
+        """
+        if self._threads:
+            raise RuntimeError("Displays must be added before start()")
+        name = name or f"display{len(self._displays)}"
+        self._metrics[name] = StageMetrics(name)
+        self._displays.append((name, render, interval))
+
+    def latest(self):
+        """Return the most recent calibrated Block (or None)."""
+        with self._latest_lock:
+            return self._latest
+
+    def start(self):
+        """Start all stage threads."""
+        targets = [('acquisition', self._acquire), ('calibration', self._calibrate)]
+        if self._log_q is not None:
+            targets.append(('logging', self._log))
+        for name, render, interval in self._displays:
+            targets.append((name, lambda n=name, r=render, i=interval: self._display(n, r, i)))
+
+        for name, target in targets:
+            t = threading.Thread(target=target, name=f"live-{name}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self, timeout=None):
+        """
+        Stop acquisition and wait until every block already read has been
+        calibrated and logged.
+        """
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+
+    def metrics(self):
+        """Return per-stage counters, latencies and queue depths."""
+        out = {name: m.snapshot() for name, m in self._metrics.items()}
+        queues = [('acquisition', self._calib_q)]
+        if self._log_q is not None:
+            queues.append(('calibration', self._log_q))
+        for name, q in queues:  # the queue each stage feeds
+            out[name]['queue_depth'] = q.depth()
+            out[name]['queue_max_depth'] = q.max_depth
+            out[name]['queue_overflow'] = q.overflow()
+            out[name]['spilled'] = q.spilled
+        return out
+
+    # ---------------------------------------------------------------- stages
+
+    def _dead_letter(self, stage, block, tb):
+        """Keep a block that could not be processed and report why."""
+        self._metrics[stage].add_dead_letter()
+        self.log_fn(f"[{stage}] block {block.seq} moved to dead letters:\n{tb}")
+        if self.dead_letter_path is not None:
+            record = {
+                'stage': stage,
+                'seq': block.seq,
+                'error': tb.strip().splitlines()[-1],
+                'raw': {f"{b}/{ch}": list(v) for (b, ch), v in block.raw.items()},
+                'values': None if block.values is None else
+                          {f"{b}/{ch}": list(v) for (b, ch), v in block.values.items()},
+            }
+            try:
+                with self._dead_lock, open(self.dead_letter_path, 'a') as f:
+                    f.write(json.dumps(record) + "\n")
+                return
+            except (OSError, TypeError, ValueError):
+                self.log_fn(f"[{stage}] could not write dead letter file:\n{traceback.format_exc()}")
+        with self._dead_lock:
+            self.dead_letters.append((stage, block))
+
+    def _unit(self, key):
+        display = self.input_processor.config.channel_display
+        if not self.calibration or key[1] not in display.get(key[0], {}):
+            return "mA"
+        return display[key[0]][key[1]]['unit']
+
+    def _acquire(self):
+        metrics = self._metrics['acquisition']
+        seq = 0
+        delay = READ_RETRY_DELAY
+        while not self._stop.is_set():
+            start = time.monotonic()
+            try:
+                raw = self.read_block()
+            except Exception:
+                metrics.add_error()
+                self.log_fn(f"[acquisition] read_block failed, retrying in {delay:g} s:\n"
+                            f"{traceback.format_exc()}")
+                self._stop.wait(delay)
+                delay = min(delay * 2, READ_RETRY_MAX_DELAY)
+                continue
+            delay = READ_RETRY_DELAY
+            if raw is None:
+                break
+            now = time.monotonic()
+            metrics.record(now - start, 0.0)
+            self._calib_q.put(Block(seq, now, raw))
+            seq += 1
+        self._calib_q.close()
+        self._stop.set()
+
+    def _calibrate(self):
+        metrics = self._metrics['calibration']
+        scale = self.input_processor.scale_input
+        while True:
+            block = self._calib_q.get()
+            if block is _STOP:
+                break
+            start = time.monotonic()
+            try:
+                block.values = {
+                    key: [scale(key[0], key[1], x, self.calibration)[0] for x in samples]
+                    for key, samples in block.raw.items()
+                }
+                block.units = {key: self._unit(key) for key in block.raw}
+            except Exception:
+                # Scaling is deterministic, so a retry would fail the same way
+                metrics.add_error()
+                block.values = block.units = None
+                self._dead_letter('calibration', block, traceback.format_exc())
+                continue
+
+            with self._latest_lock:
+                self._latest = block
+            end = time.monotonic()
+            metrics.record(end - start, end - block.t_acquired)
+            if self._log_q is not None:
+                self._log_q.put(block)
+
+        if self._log_q is not None:
+            self._log_q.close()
+
+    def _log(self):
+        metrics = self._metrics['logging']
+        while True:
+            block = self._log_q.get()
+            if block is _STOP:
+                break
+            start = time.monotonic()
+            if not self._log_with_retry(block, metrics):
+                continue
+            end = time.monotonic()
+            metrics.record(end - start, end - block.t_acquired)
+
+    def _log_with_retry(self, block, metrics):
+        """Call log_block up to LOG_RETRIES times with backoff; dead-letter the block on failure."""
+        delay = LOG_RETRY_DELAY
+        for attempt in range(1, LOG_RETRIES + 1):
+            try:
+                self.log_block(block)
+                return True
+            except Exception:
+                metrics.add_error()
+                if attempt == LOG_RETRIES:
+                    self._dead_letter('logging', block, traceback.format_exc())
+                    return False
+                metrics.add_retry()
+                time.sleep(delay)
+                delay *= 2
+
+    def _display(self, name, render, interval):
+        metrics = self._metrics[name]
+        last_seq = -1
+        while not self._stop.wait(interval):
+            block = self.latest()
+            if block is None or block.seq == last_seq:
+                continue
+            start = time.monotonic()
+            try:
+                render(block)
+            except Exception:
+                metrics.add_error()
+                self.log_fn(f"[{name}] render failed for block {block.seq}:\n{traceback.format_exc()}")
+            end = time.monotonic()
+            metrics.record(end - start, end - block.t_acquired, coalesced=block.seq - last_seq - 1)
+            last_seq = block.seq
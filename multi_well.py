@@ -0,0 +1,358 @@
+"""
+Multi-well service: many wells processed concurrently in one process.
+
+Each well has its own CalibrationConfig, CSV source, sample buffer, log
+directory and Firebase references. Wells are sharded across a pool of worker
+threads that share one loaded model and one copy of the calibration code, so
+a single host can serve many wells without loading the model per well.
+
+Per well, every poll reads only the rows appended to its CSV since the last
+poll, calibrates the board channels, keeps the last PREDICTION_WINDOW samples
+and runs the shared model once PREDICTION_WINDOW new samples have arrived.
+Each prediction is appended to the well's log and published to its
+'current' reference and to a numbered 'updates/update_<n>' reference. The
+file offset and the update counter are saved in the log directory after every
+poll, so a restarted service continues where it stopped instead of replaying
+the whole recording.
+"""
+import csv
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import parameters
+from calibration import CalibrationConfig, InputProcessor
+from data_processing.pipeline import BOARD_COLUMNS, read_new_lines, board_channel
+
+
+def _parse_key(key):
+    """Turn a JSON calibration key like '1/I0' into (1, 'I0')."""
+    board, channel = key.split('/')
+    return int(board), channel
+
+
+class WellConfig:
+    """Per-well paths, Firebase references and calibration."""
+
+    def __init__(self, well_id, csv_path, log_directory=None, calibration=None):
+        """
+        Args:
+            well_id: Well identifier (used in the Firebase references)
+            csv_path: Recording CSV of this well
+            log_directory: Directory for this well's prediction log (default: LOG_DIRECTORY/<well_id>)
+            calibration: CalibrationConfig (default: values from parameters.py)
+        """
+        self.well_id = well_id
+        self.csv_path = Path(csv_path)
+        self.log_directory = Path(log_directory) if log_directory else parameters.LOG_DIRECTORY / well_id
+        self.calibration = calibration or CalibrationConfig.from_parameters()
+        self.reference_current = parameters.FIREBASE_DATABASE_REFERENCE_CURRENT_TEMPLATE.format(well_id=well_id)
+        self.reference_update = parameters.FIREBASE_DATABASE_REFERENCE_UPDATE_TEMPLATE.format(well_id=well_id)
+
+    @classmethod
+    def from_dict(cls, entry):
+        """
+        Build a WellConfig from one JSON entry.
+
+        Calibration tables not given in the entry fall back to parameters.py:
+            {"well_id": "wellID_2", "csv_path": "...", "log_directory": "...",
+             "calibration": {"curve": {"1/I0": [3.998, 15.976, 5.0]},
+                             "linear": {"3/I3": [0.0, 500.0, 4.0, 16.0]},
+                             "output": {"VFD": [0.0, 60.0, 4.0, 16.0]},
+                             "crl_error_removal": 5, "alicat_error_removal": 1}}
+        """
+        base = CalibrationConfig.from_parameters()
+        cal = entry.get('calibration', {})
+        curve = dict(base.sensor_calibration_curve)
+        curve.update({_parse_key(k): tuple(v) for k, v in cal.get('curve', {}).items()})
+        linear = dict(base.sensor_calibration_linear)
+        linear.update({_parse_key(k): tuple(v) for k, v in cal.get('linear', {}).items()})
+        output = dict(base.output_calibration)
+        output.update({k: tuple(v) for k, v in cal.get('output', {}).items()})
+
+        calibration = CalibrationConfig(
+            channel_display=base.channel_display,
+            sensor_calibration_curve=curve,
+            sensor_calibration_linear=linear,
+            output_calibration=output,
+            crl_error_removal=cal.get('crl_error_removal', base.crl_error_removal),
+            alicat_error_removal=cal.get('alicat_error_removal', base.alicat_error_removal),
+        )
+        return cls(entry['well_id'], entry['csv_path'], entry.get('log_directory'), calibration)
+
+
+def load_well_configs(path=None):
+    """
+    Read the wells JSON file (default: WELLS_CONFIG_PATH). Without the file,
+    the single well from parameters.py (WELL_ID, CSV_FILE_PATH) is returned.
+    """
+    path = Path(path or parameters.WELLS_CONFIG_PATH)
+    if not path.exists():
+        return [WellConfig(parameters.WELL_ID, parameters.CSV_FILE_PATH, parameters.LOG_DIRECTORY)]
+    with open(path) as f:
+        return [WellConfig.from_dict(entry) for entry in json.load(f)]
+
+
+def load_model(model_path=None):
+    """Load the shared flow-rate model (torch) once, in eval mode."""
+    import torch
+
+    model = torch.load(model_path or parameters.MODEL_PATH, map_location='cpu', weights_only=False)
+    model.eval()
+    return model
+
+
+def make_torch_predict(model):
+    """
+    Wrap a torch model as predict(window) -> (Qo, Qg, Qw).
+
+    The window is passed as a (1, PREDICTION_WINDOW, channels) float32 tensor.
+    """
+    import torch
+
+    def predict(window):
+        with torch.no_grad():
+            x = torch.tensor([window], dtype=torch.float32)
+            q = model(x).reshape(-1).tolist()
+        return q[0], q[1], q[2]
+
+    return predict
+
+
+class WellMetrics:
+    """Throughput/latency counters of one well."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+        self.rows = 0
+        self.predictions = 0
+        self.poll_s_max = 0.0
+        self.predict_s_sum = 0.0
+        self.predict_s_max = 0.0
+        self.errors = 0
+        self.last_error = None
+
+    def add_rows(self, n):
+        with self._lock:
+            self.rows += n
+
+    def add_poll(self, seconds):
+        with self._lock:
+            self.poll_s_max = max(self.poll_s_max, seconds)
+
+    def add_prediction(self, seconds):
+        with self._lock:
+            self.predictions += 1
+            self.predict_s_sum += seconds
+            self.predict_s_max = max(self.predict_s_max, seconds)
+
+    def add_error(self, error):
+        with self._lock:
+            self.errors += 1
+            self.last_error = repr(error)
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = max(time.monotonic() - self.started, 1e-9)
+            return {
+                'rows': self.rows,
+                'rows_per_s': self.rows / elapsed,
+                'predictions': self.predictions,
+                'predict_latency_mean_s': self.predict_s_sum / self.predictions if self.predictions else 0.0,
+                'predict_latency_max_s': self.predict_s_max,
+                'poll_latency_max_s': self.poll_s_max,
+                'errors': self.errors,
+                'last_error': self.last_error,
+            }
+
+
+class WellState:
+    """Buffers and file position of one well."""
+
+    def __init__(self, config, window):
+        self.config = config
+        self.input_processor = InputProcessor(config.calibration)
+        self.buffer = deque(maxlen=window)
+        self.new_samples = 0
+        self.offset = 0  # bytes of the CSV consumed so far (see pipeline.read_new_lines)
+        self.columns = None
+        self.updates = 0  # number of the next updates/update_<n> reference
+        self.metrics = WellMetrics()
+        self.log_path = config.log_directory / f"predictions_{config.well_id}.csv"
+        self.state_path = config.log_directory / f"state_{config.well_id}.json"
+        self.load()
+
+    def load(self):
+        """Restore offset, header and update counter saved by a previous run."""
+        try:
+            with open(self.state_path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.offset = saved.get('offset', 0)
+        self.columns = saved.get('columns')
+        self.updates = saved.get('updates', 0)
+
+    def save(self):
+        """Write offset, header and update counter (atomically) to state_path."""
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'offset': self.offset, 'columns': self.columns, 'updates': self.updates}, f)
+        os.replace(tmp, self.state_path)
+
+    def reset(self):
+        """Start over on a replaced or truncated CSV."""
+        self.offset, self.columns = 0, None
+        self.buffer.clear()
+        self.new_samples = 0
+
+
+class MultiWellService:
+    """Shards wells across worker threads sharing one model."""
+
+    def __init__(self, wells, predict=None, workers=None, poll_interval=None,
+                 window=None, publish=None, calibration=None):
+        """
+        Args:
+            wells: List of WellConfig
+            predict: Callable window -> (Qo, Qg, Qw); default loads MODEL_PATH once
+            workers: Number of worker threads (default: MULTI_WELL_WORKERS)
+            poll_interval: Seconds between polls of a well (default: MULTI_WELL_POLL_INTERVAL)
+            window: Samples per prediction (default: PREDICTION_WINDOW)
+            publish: Optional callable publish(reference, payload), e.g. a Firebase writer
+            calibration: Calibrate samples before prediction (default: PREDICTION_CALIBRATION)
+        """
+        self.predict = predict or make_torch_predict(load_model())
+        self.workers = workers or parameters.MULTI_WELL_WORKERS
+        self.poll_interval = poll_interval or parameters.MULTI_WELL_POLL_INTERVAL
+        self.window = window or parameters.PREDICTION_WINDOW
+        self.publish = publish
+        self.calibration = parameters.PREDICTION_CALIBRATION if calibration is None else calibration
+        self.factors = (parameters.Q_OIL_FACOTR, parameters.Q_GAS_FACOTR, parameters.Q_WATER_FACOTR)
+
+        self.states = {w.well_id: WellState(w, self.window) for w in wells}
+        if len(self.states) != len(wells):
+            raise ValueError("Duplicate well_id in well configs")
+        self._stop = threading.Event()
+        self._threads = []
+
+    def shards(self):
+        """Return the wells of each worker (round-robin by position)."""
+        states = list(self.states.values())
+        n = min(self.workers, len(states)) or 1
+        return [states[i::n] for i in range(n)]
+
+    def start(self):
+        """Start one worker thread per shard."""
+        for i, shard in enumerate(self.shards()):
+            t = threading.Thread(target=self._run_shard, args=(shard,), name=f"wells-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self, timeout=None):
+        """Stop the workers after their current poll."""
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+
+    def metrics(self):
+        """Return {well_id: metrics dict}."""
+        return {well_id: s.metrics.snapshot() for well_id, s in self.states.items()}
+
+    def _run_shard(self, shard):
+        while not self._stop.is_set():
+            for state in shard:
+                start = time.monotonic()
+                try:
+                    self.poll(state)
+                except Exception as e:
+                    state.metrics.add_error(e)
+                state.metrics.add_poll(time.monotonic() - start)
+            self._stop.wait(self.poll_interval)
+
+    def _read_rows(self, state):
+        """Return rows appended to the well's CSV since the last poll."""
+        path = state.config.csv_path
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return []
+        if size < state.offset:  # file replaced: start over
+            state.reset()
+        if size == state.offset:
+            return []
+
+        data = read_new_lines(path, state)
+        lines = data.decode('utf-8', errors='replace').splitlines()
+        if not lines:
+            return []
+
+        if state.columns is None:
+            state.columns = next(csv.reader(lines[:1]))
+            lines = lines[1:]
+        return list(csv.DictReader(lines, fieldnames=state.columns))
+
+    def poll(self, state):
+        """Process the new rows of one well and predict when a window is complete."""
+        rows = self._read_rows(state)
+        if not rows:
+            return
+        state.metrics.add_rows(len(rows))
+
+        missing = [c for c in BOARD_COLUMNS if c not in state.columns]
+        if missing:
+            state.metrics.add_error(KeyError(f"{state.config.csv_path} has no columns {missing}"))
+            state.save()
+            return
+
+        channels = [board_channel(c) for c in BOARD_COLUMNS]
+        scale = state.input_processor.scale_input
+        for row in rows:
+            try:
+                sample = [scale(board, ch, float(row[col]), self.calibration)[0]
+                          for col, (board, ch) in zip(BOARD_COLUMNS, channels)]
+            except (TypeError, ValueError) as e:
+                state.metrics.add_error(e)  # malformed row
+                continue
+            state.buffer.append(sample)
+            state.new_samples += 1
+
+            if len(state.buffer) == self.window and state.new_samples >= self.window:
+                state.new_samples = 0
+                # A failed window must not cost the rest of this poll's rows
+                try:
+                    self._predict(state, row.get('Timestamp'))
+                except Exception as e:
+                    state.metrics.add_error(e)
+
+        state.save()
+
+    def _predict(self, state, timestamp):
+        start = time.monotonic()
+        q = self.predict(list(state.buffer))
+        elapsed = time.monotonic() - start
+
+        payload = dict(zip(parameters.FIREBASE_DATABASE_FIELDS, (v * f for v, f in zip(q, self.factors))))
+        payload['timestamp'] = timestamp or time.strftime('%Y-%m-%d %H:%M:%S')
+
+        state.log_path.parent.mkdir(parents=True, exist_ok=True)
+        new_file = not state.log_path.exists()
+        with open(state.log_path, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['timestamp', *parameters.FIREBASE_DATABASE_FIELDS])
+            if new_file:
+                writer.writeheader()
+            writer.writerow(payload)
+
+        if self.publish is not None:
+            update = f"{state.config.reference_update}{state.updates}"
+            state.updates += 1
+            self.publish(state.config.reference_current, payload)
+            self.publish(update, payload)
+
+        state.metrics.add_prediction(elapsed)
@@ -17,6 +17,11 @@ LOG_DIRECTORY = Path(r'logs_test1') # Directory to save logs
 GUI_UPDATE_INTERVAL = 0.1  # Update GUI every 100ms
 
 
+# ============= Multi-well service (multi_well.py) Configs
+WELLS_CONFIG_PATH = Path(r'wells.json')  # JSON list of wells (well_id, csv_path, log_directory, calibration)
+MULTI_WELL_WORKERS = 4  # Worker threads the wells are sharded across
+MULTI_WELL_POLL_INTERVAL = 1.0  # Seconds between polls of each well's CSV
+
 # ============= USER APP (main_user.py) Configs 
 USER_LOG_DIRECTORY = Path(r'logs_user')  # Directory to save user logs
 PREDICTION_WINDOW = 20 # Number of samples to predict Qo, Qg, Qw in seconds
@@ -130,13 +135,17 @@ LOG_EN = False  # Enable/disable console logging to file
 COMMAND_LOG_EN = False  # Enable/disable printing of ADC commands
 BAR_WIDTH = 50  # Width of the bargraph in characters
 BAR_UPDATE_INTERVAL = 3.0  # Update bargraph every second
+PIPELINE_QUEUE_SIZE = 256  # ADC blocks kept in memory between live pipeline stages (acquisition -> calibration -> logging)
+PIPELINE_SPILL_DIR = None  # Folder for blocks beyond PIPELINE_QUEUE_SIZE (None = keep them in memory)
 
 # ============= Google Firebase Server Configuration 
 # Firebase configuration
 DATABASE_URL = 'https://mlcanapp-default-rtdb.firebaseio.com'
 WELL_ID = "wellID_1"
-FIREBASE_DATABASE_REFERENCE_CURRENT = f'wells/{WELL_ID}/current'
-FIREBASE_DATABASE_REFERENCE_UPDATE = f'wells/{WELL_ID}/updates/update_'
+FIREBASE_DATABASE_REFERENCE_CURRENT_TEMPLATE = 'wells/{well_id}/current'
+FIREBASE_DATABASE_REFERENCE_UPDATE_TEMPLATE = 'wells/{well_id}/updates/update_'
+FIREBASE_DATABASE_REFERENCE_CURRENT = FIREBASE_DATABASE_REFERENCE_CURRENT_TEMPLATE.format(well_id=WELL_ID)
+FIREBASE_DATABASE_REFERENCE_UPDATE = FIREBASE_DATABASE_REFERENCE_UPDATE_TEMPLATE.format(well_id=WELL_ID)
 FIREBASE_DATABASE_FIELDS = [
     "oilProduction",
     "gasProduction",
@@ -0,0 +1,197 @@
+"""
+PVT property lookup and interpolation over OLGA .tab PVTTABLE POINT grids.
+
+The .tab parser is shared with Olga_utility.py (which only adds the Streamlit
+editor on top). A PVTTable detects the pressure/temperature axes of the table,
+reshapes the points into a (n_P, n_T, n_columns) grid once, and then answers
+whole arrays of (P, T) queries with vectorized bilinear interpolation.
+Tables are cached by the SHA-1 of the file content.
+"""
+import hashlib
+import re
+
+import numpy as np
+
+# Column names recognised as the grid axes (first match wins)
+PRESSURE_COLUMNS = ('PT', 'P', 'PRESSURE', 'PRES')
+TEMPERATURE_COLUMNS = ('TM', 'T', 'TEMPERATURE', 'TEMP')
+
+# Queries are evaluated in blocks of this many points to bound temporary memory
+QUERY_BLOCK = 65536
+
+_TABLE_CACHE = {}
+
+
+def parse_pvt_points(content):
+    """
+    Parse the last COLUMNS=(...) header and its PVTTABLE POINT rows.
+
+    Args:
+        content: .tab file content as str
+
+    Returns:
+        tuple: (cols, rows) with rows a list of float lists
+    """
+    # --- Find the LAST COLUMNS= (...) block ---
+    col_matches = re.findall(r"COLUMNS\s*=\s*\((.*?)\)", content, re.DOTALL)
+    if not col_matches:
+        raise ValueError("No COLUMNS header found in file")
+    cols_text = col_matches[-1]  # ✅ use the last one
+    cols = re.split(r"[\s,]+", cols_text.strip())  # split on space/comma
+
+    # --- Extract PVTTABLE POINT rows (after last COLUMNS) ---
+    # Only keep the content after the last "COLUMNS"
+    content_after_cols = content[content.rfind("COLUMNS"):]
+    data = re.findall(r"PVTTABLE POINT\s*=\s*\((.*?)\)", content_after_cols, re.DOTALL)
+
+    rows = []
+    for row in data:
+        # split on commas, strip spaces/tabs
+        values = [x.strip() for x in row.replace("\n", " ").split(",") if x.strip()]
+        values = [float(x) for x in values]
+        rows.append(values)
+
+    # sanity check
+    for i, r in enumerate(rows):
+        if len(r) != len(cols):
+            raise ValueError(f"Row {i} has {len(r)} values but expected {len(cols)}")
+
+    return cols, rows
+
+
+def _find_axis(cols, candidates, fallback):
+    upper = [c.upper() for c in cols]
+    for name in candidates:
+        if name in upper:
+            return upper.index(name)
+    return fallback
+
+
+class PVTTable:
+    """Rectangular P/T grid of PVT properties with vectorized bilinear lookup."""
+
+    def __init__(self, cols, rows, pressure_col=None, temperature_col=None):
+        """
+        Args:
+            cols: Column names from the COLUMNS header
+            rows: PVTTABLE POINT rows (list of lists or 2-D array)
+            pressure_col: Name of the pressure axis column (default: auto-detect)
+            temperature_col: Name of the temperature axis column (default: auto-detect)
+        """
+        points = np.asarray(rows, dtype=np.float64)
+        if points.ndim != 2 or points.shape[1] != len(cols) or len(points) == 0:
+            raise ValueError("PVT table has no points or mismatched columns")
+
+        self.columns = list(cols)
+        p_idx = self.columns.index(pressure_col) if pressure_col else _find_axis(cols, PRESSURE_COLUMNS, 0)
+        t_idx = self.columns.index(temperature_col) if temperature_col else _find_axis(cols, TEMPERATURE_COLUMNS, 1)
+        if p_idx == t_idx:
+            raise ValueError("Pressure and temperature axes must be different columns")
+        self.pressure_col = self.columns[p_idx]
+        self.temperature_col = self.columns[t_idx]
+
+        self.pressure = np.unique(points[:, p_idx])
+        self.temperature = np.unique(points[:, t_idx])
+        n_p, n_t = len(self.pressure), len(self.temperature)
+        if n_p * n_t != len(points):
+            raise ValueError(
+                f"PVT points do not form a full P/T grid: {n_p} x {n_t} != {len(points)} points"
+            )
+        # A duplicated point plus a missing one passes the count check above
+        n_pairs = len(np.unique(points[:, [p_idx, t_idx]], axis=0))
+        if n_pairs != len(points):
+            raise ValueError(
+                f"PVT points contain {len(points) - n_pairs} duplicated P/T pairs (and as many missing)"
+            )
+        if n_p < 2 or n_t < 2:
+            raise ValueError("PVT grid needs at least two pressures and two temperatures")
+
+        # Property columns only, laid out as grid[i_p, i_t, k]
+        self.properties = [c for i, c in enumerate(self.columns) if i not in (p_idx, t_idx)]
+        prop_idx = [self.columns.index(c) for c in self.properties]
+        order = np.lexsort((points[:, t_idx], points[:, p_idx]))
+        self.grid = np.ascontiguousarray(points[order][:, prop_idx].reshape(n_p, n_t, len(prop_idx)))
+
+    @classmethod
+    def from_content(cls, content, **kwargs):
+        """Build a table from .tab file content (str)."""
+        cols, rows = parse_pvt_points(content)
+        return cls(cols, rows, **kwargs)
+
+    def _cell(self, axis, x, clamp):
+        """Return lower cell index and fractional position along one axis."""
+        i = np.clip(np.searchsorted(axis, x, side='right') - 1, 0, len(axis) - 2)
+        lo, hi = axis[i], axis[i + 1]
+        w = (x - lo) / (hi - lo)
+        if clamp:
+            w = np.clip(w, 0.0, 1.0)
+        return i, w
+
+    def interpolate(self, pressure, temperature, columns=None, clamp=True):
+        """
+        Bilinear interpolation of properties at arrays of (P, T) points.
+
+        Bilinear interpolation is monotone between grid nodes along each axis,
+        so it never overshoots the tabulated values.
+
+        Args:
+            pressure: Scalar or array of pressures (same unit as the table)
+            temperature: Scalar or array of temperatures, broadcastable with pressure
+            columns: Property name or list of names (default: all properties)
+            clamp: Clamp queries outside the grid to its edges instead of extrapolating
+
+        Returns:
+            dict {column: array} when columns is a list or None,
+            otherwise a single array
+        """
+        single = isinstance(columns, str)
+        names = [columns] if single else list(columns or self.properties)
+        k = [self.properties.index(c) for c in names]
+        grid = self.grid[:, :, k]
+
+        p, t = np.broadcast_arrays(np.asarray(pressure, dtype=np.float64),
+                                   np.asarray(temperature, dtype=np.float64))
+        shape = p.shape
+        p, t = p.ravel(), t.ravel()
+        out = np.empty((p.size, len(k)), dtype=np.float64)
+
+        for s in range(0, p.size, QUERY_BLOCK):
+            sl = slice(s, s + QUERY_BLOCK)
+            ip, wp = self._cell(self.pressure, p[sl], clamp)
+            it, wt = self._cell(self.temperature, t[sl], clamp)
+            wp, wt = wp[:, None], wt[:, None]
+            out[sl] = (
+                grid[ip, it] * (1 - wp) * (1 - wt)
+                + grid[ip + 1, it] * wp * (1 - wt)
+                + grid[ip, it + 1] * (1 - wp) * wt
+                + grid[ip + 1, it + 1] * wp * wt
+            )
+
+        if single:
+            return out[:, 0].reshape(shape)
+        return {name: out[:, j].reshape(shape) for j, name in enumerate(names)}
+
+
+def load_pvt_table(source, **kwargs):
+    """
+    Return a (cached) PVTTable for a .tab file.
+
+    Args:
+        source: Path, raw bytes content, or a file-like object with .read()
+        **kwargs: Passed to PVTTable (pressure_col, temperature_col)
+    """
+    if hasattr(source, 'read'):
+        raw = source.read()
+    elif isinstance(source, bytes):
+        raw = source
+    else:
+        with open(source, 'rb') as f:
+            raw = f.read()
+    if isinstance(raw, str):
+        raw = raw.encode('utf-8')
+
+    key = (hashlib.sha1(raw).hexdigest(), tuple(sorted(kwargs.items())))
+    table = _TABLE_CACHE.get(key)
+    if table is None:
+        table = _TABLE_CACHE[key] = PVTTable.from_content(raw.decode('utf-8'), **kwargs)
+    return table